@@ -16,8 +16,10 @@ NOTE:
 - Targets the in-memory FastAPI API in day8_fastapi_rest_api.py
 """
 
+import pytest
 from fastapi.testclient import TestClient
-from day8_fastapi_rest_api import app
+from day8_fastapi_rest_api import COMPRESSOR, METRICS, app
+from api_utils import ASGIOverloadMiddleware, ConcurrencyLimiter, RateLimiter
 
 client = TestClient(app)
 
@@ -54,3 +56,108 @@ def test_pagination():
     data = r.json()
     assert data["limit"] == 2
     assert len(data["items"]) <= 2
+
+
+def test_cursor_pagination():
+    for i in range(3):
+        client.post("/api/v1/tasks", json={"title": f"C{i}"})
+    first = client.get("/api/v1/tasks?cursor=&limit=2").json()
+    assert len(first["items"]) == 2
+    second = client.get(f"/api/v1/tasks?cursor={first['next_cursor']}&limit=2").json()
+    first_ids = {t["id"] for t in first["items"]}
+    assert not first_ids & {t["id"] for t in second["items"]}
+
+
+def test_sort_newest_first():
+    ids = [client.post("/api/v1/tasks", json={"title": f"S{i}"}).json()["id"] for i in range(2)]
+    items = client.get("/api/v1/tasks?sort=-createdAt&limit=2").json()["items"]
+    assert [t["id"] for t in items] == ids[::-1]
+    client.patch(f"/api/v1/tasks/{ids[0]}", json={"title": "S0 again"})
+    assert client.get("/api/v1/tasks?sort=-updatedAt&limit=1").json()["items"][0]["id"] == ids[0]
+    assert client.get("/api/v1/tasks?sort=bogus").status_code == 422
+
+
+def test_title_search():
+    task_id = client.post("/api/v1/tasks", json={"title": "Renew passport"}).json()["id"]
+    data = client.get("/api/v1/tasks?q=passport renew").json()
+    assert data["total"] == 1 and data["items"][0]["id"] == task_id
+    assert client.get("/api/v1/tasks?q=passport visa").json()["total"] == 0
+
+
+def test_conditional_get():
+    task_id = client.post("/api/v1/tasks", json={"title": "Poll me"}).json()["id"]
+    etag = client.get(f"/api/v1/tasks/{task_id}").headers["etag"]
+    r = client.get(f"/api/v1/tasks/{task_id}", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+
+    list_etag = client.get("/api/v1/tasks").headers["etag"]
+    assert client.get("/api/v1/tasks", headers={"If-None-Match": list_etag}).status_code == 304
+    client.patch(f"/api/v1/tasks/{task_id}", json={"title": "Changed"})
+    assert client.get("/api/v1/tasks", headers={"If-None-Match": list_etag}).status_code == 200
+
+
+def test_export_streams_ndjson():
+    client.post("/api/v1/tasks", json={"title": "Exported"})
+    r = client.get("/api/v1/tasks:export")
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = r.text.splitlines()
+    assert len(lines) == client.get("/api/v1/tasks").json()["total"]
+
+
+def test_fast_path_keeps_the_list_contract():
+    client.post("/api/v1/tasks", json={"title": "Contract"})
+    schema = app.openapi()["paths"]["/api/v1/tasks"]["get"]["responses"]["200"]
+    assert schema["content"]["application/json"]["schema"]["$ref"].endswith("/ListEnvelope")
+
+    data = client.get("/api/v1/tasks?limit=200").json()
+    assert set(data) == {"items", "total", "limit", "offset", "next_cursor"}
+    assert set(data["items"][0]) == {"id", "title", "status", "createdAt", "updatedAt"}
+
+
+def test_overload_middleware():
+    limited = TestClient(ASGIOverloadMiddleware(app, rate_limiter=RateLimiter(1, burst=1)))
+    assert limited.get("/api/v1/tasks").status_code == 200
+    r = limited.get("/api/v1/tasks")
+    assert r.status_code == 429 and r.headers["retry-after"] == "1"
+
+    busy = ConcurrencyLimiter(initial=2)
+    busy.try_acquire(), busy.try_acquire()
+    assert TestClient(ASGIOverloadMiddleware(app, concurrency=busy)).get("/api/v1/tasks").status_code == 503
+    busy.release(0.0)
+    guarded = TestClient(ASGIOverloadMiddleware(app, concurrency=busy))
+    assert guarded.get("/api/v1/tasks").status_code == 200 and busy.inflight == 1
+
+
+def test_idempotency_key():
+    headers = {"Idempotency-Key": "fastapi-retry"}
+    first = client.post("/api/v1/tasks", json={"title": "Once"}, headers=headers)
+    retry = client.post("/api/v1/tasks", json={"title": "Once"}, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json() and retry.headers["idempotent-replayed"] == "true"
+    assert client.post("/api/v1/tasks", json={"title": "Other"}, headers=headers).status_code == 422
+
+
+@pytest.mark.skipif(COMPRESSOR is None, reason="TASK_COMPRESSION=0")
+def test_list_pages_are_compressed():
+    for i in range(20):
+        client.post("/api/v1/tasks", json={"title": f"Compress me {i}"})
+    plain = client.get("/api/v1/tasks?limit=20", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    r = client.get("/api/v1/tasks?limit=20", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and r.headers["vary"] == "Accept-Encoding"
+    assert r.content == plain.content  # httpx decodes it back
+    assert int(r.headers["content-length"]) < len(plain.content) / 3
+    assert r.headers["etag"] == "W/" + plain.headers["etag"]
+    revalidate = {"Accept-Encoding": "gzip", "If-None-Match": r.headers["etag"]}
+    assert client.get("/api/v1/tasks?limit=20", headers=revalidate).status_code == 304
+
+
+@pytest.mark.skipif(METRICS is None, reason="TASK_METRICS=0")
+def test_metrics_endpoint():
+    task_id = client.post("/api/v1/tasks", json={"title": "Measure me"}).json()["id"]
+    client.get(f"/api/v1/tasks/{task_id}")
+    text = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/tasks/{task_id}",status="200"}' in text
+    assert 'http_request_size_bytes_count{method="POST",route="/api/v1/tasks",status="201"}' in text
+    assert task_id not in text
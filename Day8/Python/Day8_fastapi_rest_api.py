@@ -18,11 +18,23 @@ Open docs:
 
 from __future__ import annotations
 
-from fastapi import FastAPI, HTTPException, Query
+import os
+from typing import Literal
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from datetime import datetime
 from uuid import uuid4, UUID
 
+from api_utils import (
+    ASGICompressionMiddleware, ASGIMetricsMiddleware, ASGIOverloadMiddleware, CompressedCache, Compressor,
+    ConcurrencyLimiter, IdempotencyCache, Metrics, RateLimiter, SnapshotTaskStore, SqliteTaskStore, StoredResponse,
+    TaskStore, decode_cursor, encode_cursor, if_none_match, jsonenc, list_etag, open_logged_store, scan_tasks,
+    task_etag,
+)
+from api_utils.idempotency import REPLAYED_HEADER, check_key
+
 # ============================================================
 # WHAT/WHY FastAPI:
 # - Type hints + Pydantic give automatic validation + OpenAPI docs.
@@ -32,7 +44,78 @@ from uuid import uuid4, UUID
 app = FastAPI(title="Task Tracker API", version="1.0.0")
 
 # In-memory storage for training (same warning as Flask).
-TASKS: dict[UUID, dict] = {}
+# Same TaskStore as the Flask app: dict + ordered/status indexes.
+# TASK_STORE_PATH=<file> shares one SQLite store across `uvicorn --workers N`.
+# TASK_WAL_PATH=<file> logs every write and replays the log on startup
+# (same TASK_WAL_FLUSH_MS / TASK_WAL_FLUSH_EVERY knobs as the Flask app).
+# TASK_SNAPSHOT_PATH=<file> (+ TASK_WAL_PATH) boots from a memory-mapped
+# snapshot + the WAL tail instead of replaying the whole log: single-task
+# GETs work right away, the rest once hydration finishes in the background.
+# A new snapshot is written every TASK_SNAPSHOT_EVERY seconds (if changed).
+TASK_STORE_PATH = os.getenv("TASK_STORE_PATH")
+TASK_WAL_PATH = os.getenv("TASK_WAL_PATH")
+TASK_SNAPSHOT_PATH = os.getenv("TASK_SNAPSHOT_PATH")
+if TASK_STORE_PATH:
+    TASKS = SqliteTaskStore(TASK_STORE_PATH, id_type=UUID)
+elif TASK_SNAPSHOT_PATH:
+    TASKS = SnapshotTaskStore(
+        TASK_SNAPSHOT_PATH,
+        TASK_WAL_PATH,
+        id_type=UUID,
+        flush_interval=float(os.getenv("TASK_WAL_FLUSH_MS", "5")) / 1000,
+        flush_every=int(os.getenv("TASK_WAL_FLUSH_EVERY", "256")),
+    )
+    TASKS.start_periodic_snapshots(float(os.getenv("TASK_SNAPSHOT_EVERY", "60")))
+elif TASK_WAL_PATH:
+    TASKS = open_logged_store(
+        TASK_WAL_PATH,
+        id_type=UUID,
+        flush_interval=float(os.getenv("TASK_WAL_FLUSH_MS", "5")) / 1000,
+        flush_every=int(os.getenv("TASK_WAL_FLUSH_EVERY", "256")),
+    )
+else:
+    TASKS = TaskStore()
+
+# Response compression, same knobs as the Flask app (TASK_COMPRESSION,
+# TASK_COMPRESS_MIN_BYTES, TASK_COMPRESS_CACHE). Added first = innermost.
+COMPRESSOR = Compressor(
+    min_size=int(os.getenv("TASK_COMPRESS_MIN_BYTES", "1024")),
+    cache=CompressedCache(int(os.getenv("TASK_COMPRESS_CACHE", "1024"))),
+) if os.getenv("TASK_COMPRESSION", "1") != "0" else None
+if COMPRESSOR is not None:
+    app.add_middleware(ASGICompressionMiddleware, compressor=COMPRESSOR)
+
+# Overload protection, same env knobs as the Flask app (TASK_RATE_LIMIT,
+# TASK_RATE_BURST, TASK_CONCURRENCY_LIMIT, TASK_TARGET_LATENCY_MS, TASK_MAX_QUEUE_MS).
+# Runs before routing; errors use FastAPI's {"detail": ...} shape.
+TASK_RATE_LIMIT = float(os.getenv("TASK_RATE_LIMIT", "0"))
+TASK_CONCURRENCY_LIMIT = int(os.getenv("TASK_CONCURRENCY_LIMIT", "0"))
+if TASK_RATE_LIMIT or TASK_CONCURRENCY_LIMIT:
+    app.add_middleware(
+        ASGIOverloadMiddleware,
+        rate_limiter=RateLimiter(TASK_RATE_LIMIT, float(os.getenv("TASK_RATE_BURST", "0")) or None)
+        if TASK_RATE_LIMIT else None,
+        concurrency=ConcurrencyLimiter(
+            TASK_CONCURRENCY_LIMIT,
+            target_latency=float(os.getenv("TASK_TARGET_LATENCY_MS", "50")) / 1000,
+            max_queue_delay=float(os.getenv("TASK_MAX_QUEUE_MS", "50")) / 1000,
+        ) if TASK_CONCURRENCY_LIMIT else None,
+        error_body=lambda code, message: {"detail": message},
+        exempt_paths=("/metrics",),
+    )
+
+# Metrics (TASK_METRICS=0 turns them off), scraped at GET /metrics.
+# Added last = outermost middleware, so 429/503 refusals are counted too.
+METRICS = Metrics() if os.getenv("TASK_METRICS", "1") != "0" else None
+if METRICS is not None:
+    app.add_middleware(ASGIMetricsMiddleware, metrics=METRICS)
+
+# Idempotency-Key on POST /api/v1/tasks, same knobs as the Flask app
+# (TASK_IDEMPOTENCY_TTL seconds, TASK_IDEMPOTENCY_MAX keys).
+IDEMPOTENCY = IdempotencyCache(
+    ttl=float(os.getenv("TASK_IDEMPOTENCY_TTL", "86400")),
+    max_entries=int(os.getenv("TASK_IDEMPOTENCY_MAX", "100000")),
+)
 
 # -----------------------------
 # Request/Response Models
@@ -55,41 +138,175 @@ class ListEnvelope(BaseModel):
     items: list[TaskOut]
     total: int
     limit: int
-    offset: int
+    offset: int | None = None
+    next_cursor: str | None = None
 
 def to_out(task: dict) -> TaskOut:
     return TaskOut(**task)
 
+# -----------------------------
+# Trusted fast path for server-produced data
+# -----------------------------
+# WHY: returning TaskOut(**task) validates every task once, then FastAPI
+# validates + serializes it AGAIN through response_model. Tasks in TASKS
+# were validated on the way in (TaskIn/TaskPatch), so for them we skip
+# both steps and encode the stored record straight to JSON bytes.
+# - response_model stays on the routes -> OpenAPI schema is unchanged
+# - returning a Response makes FastAPI skip response_model validation
+# - TASK_TRUSTED_FAST_PATH=0 restores the validated path (benchmarks)
+TRUSTED_FAST_PATH = os.getenv("TASK_TRUSTED_FAST_PATH", "1") != "0"
+
+def task_json(task) -> dict:
+    """Same fields as TaskOut; jsonenc handles UUID/datetime."""
+    return {
+        "id": task["id"],
+        "title": task["title"],
+        "status": task["status"],
+        "createdAt": task["createdAt"],
+        "updatedAt": task["updatedAt"],
+    }
+
+def trusted_response(payload: dict, status_code: int = 200, etag: str | None = None) -> Response:
+    headers = {"ETag": f'"{etag}"'} if etag else None
+    return Response(jsonenc.dumps_bytes(payload), status_code=status_code, headers=headers,
+                    media_type="application/json")
+
+# -----------------------------
+# Conditional GET (ETag / If-None-Match)
+# -----------------------------
+# Same scheme as the Flask app: task ETag = task version, list ETag =
+# store version. A match returns 304 before any model/JSON work happens.
+def not_modified(request: Request, etag: str) -> Response | None:
+    if if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": f'"{etag}"'})
+    return None
+
 # -----------------------------
 # Routes
 # -----------------------------
 @app.get("/api/v1/tasks", response_model=ListEnvelope)
 def list_tasks(
+    request: Request,
+    response: Response,
     status: str | None = None,
     limit: int = Query(default=50, ge=1, le=200),
     offset: int = Query(default=0, ge=0),
+    cursor: str | None = Query(default=None, description="Empty for the first page, then next_cursor"),
+    q: str | None = Query(default=None, description="Title search: every word must match, best match first"),
+    sort: Literal["createdAt", "-createdAt", "updatedAt", "-updatedAt"] = "createdAt",
 ):
-    tasks = list(TASKS.values())
-    if status:
-        tasks = [t for t in tasks if t["status"] == status]
+    # Version first, data second: the ETag can be stale, never ahead.
+    etag = list_etag(TASKS.version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    response.headers["ETag"] = f'"{etag}"'
+
+    status = status or None
+    if q is not None:
+        # Inverted index over title words; ranked results page with offset only.
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="q can't be combined with cursor; use offset")
+        paged, total = TASKS.search(q, status, offset, limit)
+        page_offset, next_cursor = offset, None
+    elif cursor is not None:
+        # Keyset mode: O(page) at any depth, stable under concurrent inserts.
+        try:
+            after = decode_cursor(cursor, UUID) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        paged, next_key = TASKS.page_after(status, after, limit, sort)
+        total = TASKS.count(status)
+        page_offset, next_cursor = None, encode_cursor(next_key) if next_key else None
+    else:
+        # Offset mode (kept for backward compatibility).
+        # Either mode reads a sorted index (createdAt or updatedAt), never sorted().
+        paged, total = TASKS.page(status, offset, limit, sort)
+        page_offset, next_cursor = offset, None
 
-    paged = tasks[offset: offset + limit]
+    if TRUSTED_FAST_PATH:
+        return trusted_response({
+            "items": [task_json(t) for t in paged],
+            "total": total,
+            "limit": limit,
+            "offset": page_offset,
+            "next_cursor": next_cursor,
+        }, etag=etag)
     return ListEnvelope(
         items=[to_out(t) for t in paged],
-        total=len(tasks),
+        total=total,
         limit=limit,
-        offset=offset,
+        offset=page_offset,
+        next_cursor=next_cursor,
     )
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text format (per-route latency/size histograms, in-flight gauge)."""
+    if METRICS is None:
+        raise HTTPException(status_code=404, detail="Metrics are turned off (TASK_METRICS=0)")
+    return Response(METRICS.render(), media_type=Metrics.CONTENT_TYPE)
+
+@app.get("/api/v1/tasks:export")
+def export_tasks(status: str | None = None):
+    """
+    Stream every task as NDJSON (one JSON object per line).
+    WHY: paging with limit<=200 is slow for exports, and one big response
+    holds everything in memory; the generator keeps memory flat.
+    """
+    def generate():
+        for task in scan_tasks(TASKS, status or None):
+            yield jsonenc.dumps_bytes(task_json(task)) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @app.get("/api/v1/tasks/{task_id}", response_model=TaskOut)
-def get_task(task_id: UUID):
+def get_task(task_id: UUID, request: Request, response: Response):
     task = TASKS.get(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    etag = task_etag(task)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    if TRUSTED_FAST_PATH:
+        return trusted_response(task_json(task), etag=etag)
+    response.headers["ETag"] = f'"{etag}"'
     return to_out(task)
 
 @app.post("/api/v1/tasks", response_model=TaskOut, status_code=201)
-def create_task(payload: TaskIn):
+def create_task(
+    payload: TaskIn,
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key",
+                                         description="Retries with the same key return the original response"),
+):
+    if idempotency_key is None:
+        return apply_create(payload)
+    err = check_key(idempotency_key)
+    if err:
+        raise HTTPException(status_code=400, detail=err)
+
+    def run() -> StoredResponse:
+        # Always a Response here: the stored bytes are what every retry gets.
+        response = apply_create(payload)
+        if not isinstance(response, Response):
+            response = Response(response.model_dump_json(), status_code=201, media_type="application/json")
+        return StoredResponse(response.status_code, bytes(response.body), tuple(
+            (k.decode("latin-1"), v.decode("latin-1")) for k, v in response.raw_headers if k != b"content-length"
+        ))
+
+    # The validated model (not the raw bytes) is the fingerprint: key order
+    # or whitespace in a retried body doesn't count as a different request.
+    try:
+        stored, replayed = IDEMPOTENCY.execute(("/api/v1/tasks", idempotency_key), payload.model_dump_json(), run)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    headers = dict(stored.headers)
+    if replayed:
+        headers[REPLAYED_HEADER] = "true"
+    return Response(stored.body, status_code=stored.status, headers=headers)
+
+def apply_create(payload: TaskIn):
     now = datetime.utcnow()
     task_id = uuid4()
     task = {
@@ -99,7 +316,9 @@ def create_task(payload: TaskIn):
         "createdAt": now,
         "updatedAt": now,
     }
-    TASKS[task_id] = task
+    task = TASKS.add(task)
+    if TRUSTED_FAST_PATH:
+        return trusted_response(task_json(task), status_code=201)
     return to_out(task)
 
 @app.patch("/api/v1/tasks/{task_id}", response_model=TaskOut)
@@ -108,19 +327,23 @@ def patch_task(task_id: UUID, payload: TaskPatch):
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
+    changes = {"updatedAt": datetime.utcnow()}
     if payload.title is not None:
-        task["title"] = payload.title.strip()
+        changes["title"] = payload.title.strip()
     if payload.status is not None:
         if payload.status not in {"todo", "doing", "done"}:
             raise HTTPException(status_code=400, detail="Invalid status")
-        task["status"] = payload.status
+        changes["status"] = payload.status
 
-    task["updatedAt"] = datetime.utcnow()
+    task = TASKS.update(task_id, changes)
+    if task is None:  # deleted by another request since the lookup above
+        raise HTTPException(status_code=404, detail="Task not found")
+    if TRUSTED_FAST_PATH:
+        return trusted_response(task_json(task))
     return to_out(task)
 
 @app.delete("/api/v1/tasks/{task_id}", status_code=204)
 def delete_task(task_id: UUID):
-    if task_id not in TASKS:
+    if TASKS.remove(task_id) is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    del TASKS[task_id]
     return None
@@ -15,12 +15,33 @@ pytest -q
 NOTE:
 - These tests target the in-memory Flask API in day8_flask_rest_api.py
 - If you switch to DB API, you can adapt tests to point at that app instead.
+- The db_api tests at the end run day8_flask_db_api.py on a temporary
+  SQLite file (pip install sqlalchemy).
 """
 
+import base64
+import gzip
+import importlib
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
 import pytest
 
 # Import the Flask app object from the lab file.
 from day8_flask_rest_api import app as flask_app
+from day8_flask_rest_api import COMPRESSOR, METRICS, TASKS
+from werkzeug.test import Client
+
+from api_utils import (
+    ConcurrencyLimiter, FragmentCache, IdempotencyCache, RateLimiter, SnapshotTaskStore, SqliteTaskStore,
+    StoredResponse, TaskRecord, WSGIOverloadMiddleware, WriteAheadLog, open_logged_store,
+)
+from api_utils.snapshot import SnapshotView
+from api_utils.wal import replay
+from api_utils.compression import negotiate
 
 
 @pytest.fixture()
@@ -59,6 +80,20 @@ def test_patch_invalid_status(client):
     assert r2.status_code == 400
 
 
+def test_patch_of_a_task_deleted_meanwhile_returns_404(client, monkeypatch):
+    import day8_flask_rest_api as rest
+
+    task_id = client.post("/api/v1/tasks", json={"title": "Short-lived"}).get_json()["id"]
+    validate = rest.validate_task_patch
+
+    def delete_then_validate(data):  # another request deletes it between lookup and update
+        rest.apply_delete(task_id)
+        return validate(data)
+
+    monkeypatch.setattr(rest, "validate_task_patch", delete_then_validate)
+    assert client.patch(f"/api/v1/tasks/{task_id}", json={"status": "done"}).status_code == 404
+
+
 def test_pagination(client):
     # create a few tasks
     for i in range(5):
@@ -68,3 +103,551 @@ def test_pagination(client):
     data = r.get_json()
     assert data["limit"] == 2
     assert len(data["items"]) <= 2
+
+    for bad in ("limit=0", "limit=201", "offset=-1", "cursor=&limit=-5"):
+        r = client.get(f"/api/v1/tasks?{bad}")
+        assert r.status_code == 400 and r.get_json()["error"]["code"] == "VALIDATION_ERROR", bad
+    with pytest.raises(ValueError):
+        TASKS.page_after(None, None, 0)
+
+
+def test_status_filter_follows_patch_and_delete(client):
+    task_id = client.post("/api/v1/tasks", json={"title": "Index me"}).get_json()["id"]
+    done_before = client.get("/api/v1/tasks?status=done").get_json()["total"]
+
+    client.patch(f"/api/v1/tasks/{task_id}", json={"status": "done"})
+    data = client.get("/api/v1/tasks?status=done&limit=200").get_json()
+    assert data["total"] == done_before + 1
+    assert task_id in [t["id"] for t in data["items"]]
+
+    client.delete(f"/api/v1/tasks/{task_id}")
+    assert client.get("/api/v1/tasks?status=done").get_json()["total"] == done_before
+
+
+def test_sort_by_updated_and_created(client):
+    ids = [client.post("/api/v1/tasks", json={"title": f"Sort {i}"}).get_json()["id"] for i in range(3)]
+    client.patch(f"/api/v1/tasks/{ids[0]}", json={"status": "doing"})
+
+    recent = client.get("/api/v1/tasks?sort=-updatedAt&limit=1").get_json()["items"]
+    assert recent[0]["id"] == ids[0]
+    newest = client.get("/api/v1/tasks?sort=-createdAt&limit=2").get_json()["items"]
+    assert [t["id"] for t in newest] == [ids[2], ids[1]]
+
+    page = client.get("/api/v1/tasks?sort=-createdAt&cursor=&limit=1").get_json()
+    after = client.get(f"/api/v1/tasks?sort=-createdAt&cursor={page['next_cursor']}&limit=1").get_json()
+    assert after["items"][0]["id"] == ids[1]
+    assert client.get("/api/v1/tasks?sort=title").status_code == 400
+
+
+def test_title_search_follows_writes(client):
+    exact = client.post("/api/v1/tasks", json={"title": "Zebrafish"}).get_json()["id"]
+    longer = client.post("/api/v1/tasks", json={"title": "Feed the zebrafish today"}).get_json()["id"]
+
+    data = client.get("/api/v1/tasks?q=ZEBRAFISH").get_json()
+    assert data["total"] == 2
+    assert [t["id"] for t in data["items"]] == [exact, longer]  # closest match first
+    assert client.get("/api/v1/tasks?q=zebrafish feed").get_json()["total"] == 1  # AND
+
+    client.patch(f"/api/v1/tasks/{exact}", json={"title": "Goldfish"})
+    client.delete(f"/api/v1/tasks/{longer}")
+    assert client.get("/api/v1/tasks?q=zebrafish").get_json()["total"] == 0
+    assert client.get("/api/v1/tasks?q=goldfish").get_json()["items"][0]["id"] == exact
+    assert client.get("/api/v1/tasks?q=goldfish&cursor=").status_code == 400
+
+
+def test_cursor_pagination_is_stable_under_inserts(client):
+    r = client.get("/api/v1/tasks?cursor=&limit=2")
+    assert r.status_code == 200
+    first = r.get_json()
+    client.post("/api/v1/tasks", json={"title": "Inserted mid-scan"})
+
+    seen = [t["id"] for t in first["items"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        page = client.get(f"/api/v1/tasks?cursor={cursor}&limit=2").get_json()
+        seen += [t["id"] for t in page["items"]]
+        cursor = page["next_cursor"]
+    assert len(seen) == len(set(seen))
+
+    assert client.get("/api/v1/tasks?cursor=not-a-cursor").status_code == 400
+
+
+def test_cached_json_is_refreshed_after_patch(client):
+    task_id = client.post("/api/v1/tasks", json={"title": "Old"}).get_json()["id"]
+    assert client.get(f"/api/v1/tasks/{task_id}").get_json()["title"] == "Old"
+
+    client.patch(f"/api/v1/tasks/{task_id}", json={"title": "New"})
+    assert client.get(f"/api/v1/tasks/{task_id}").get_json()["title"] == "New"
+    items = client.get("/api/v1/tasks?limit=200").get_json()["items"]
+    assert [t["title"] for t in items if t["id"] == task_id] == ["New"]
+
+
+def test_batch_applies_ops_in_order(client):
+    existing = client.post("/api/v1/tasks", json={"title": "Batch target"}).get_json()["id"]
+    r = client.post("/api/v1/tasks:batch", json=[
+        {"op": "create", "data": {"title": "From batch"}},
+        {"op": "patch", "id": existing, "data": {"status": "done"}},
+        {"op": "delete", "id": "missing"},
+    ])
+    assert r.status_code == 200
+    results = r.get_json()["results"]
+    assert [x["status"] for x in results] == [201, 200, 404]
+    assert results[1]["data"]["status"] == "done"
+
+
+def test_batch_rejects_invalid_ops_without_applying(client):
+    total = client.get("/api/v1/tasks").get_json()["total"]
+    r = client.post("/api/v1/tasks:batch", json=[
+        {"op": "create", "data": {"title": "ok"}},
+        {"op": "create", "data": {}},
+    ])
+    assert r.status_code == 400
+    assert r.get_json()["error"]["details"]["errors"][0]["index"] == 1
+    assert client.get("/api/v1/tasks").get_json()["total"] == total
+
+
+def test_concurrent_patches_lose_no_updates():
+    # Threaded WSGI servers run handlers in parallel; every patch must land.
+    threads, patches_each = 8, 50
+    setup = flask_app.test_client()
+    task_id = setup.post("/api/v1/tasks", json={"title": "Contended"}).get_json()["id"]
+
+    def worker(n: int):
+        c = flask_app.test_client()
+        for i in range(patches_each):
+            c.patch(f"/api/v1/tasks/{task_id}", json={"status": ("todo", "doing", "done")[(n + i) % 3]})
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    assert TASKS.get(task_id)["version"] == 1 + threads * patches_each
+    # The task sits in exactly one status index.
+    assert sum(TASKS.count(s) for s in ("todo", "doing", "done")) == TASKS.count()
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    # Two store objects on one file stand in for two worker processes.
+    path = str(tmp_path / "shared.db")
+    worker_a, worker_b = SqliteTaskStore(path), SqliteTaskStore(path)
+    now = datetime.utcnow()
+    worker_a.add({"id": "t1", "title": "Shared", "status": "todo", "createdAt": now, "updatedAt": now})
+
+    patched = worker_b.update("t1", {"status": "done", "updatedAt": datetime.utcnow()})
+    assert patched["version"] == 2
+    assert worker_a.get("t1")["status"] == "done"
+    assert worker_a.count("done") == 1 and worker_a.count("todo") == 0
+
+
+def test_recreated_sqlite_file_does_not_reuse_list_etags(tmp_path):
+    path = tmp_path / "shared.db"
+    first = SqliteTaskStore(str(path)).version
+    for f in tmp_path.iterdir():
+        f.unlink()
+    time.sleep(0.002)
+    assert SqliteTaskStore(str(path)).version > first
+
+
+def test_conditional_get_returns_304_until_data_changes(client):
+    task_id = client.post("/api/v1/tasks", json={"title": "Poll me"}).get_json()["id"]
+    r = client.get(f"/api/v1/tasks/{task_id}")
+    etag = r.headers["ETag"]
+    assert client.get(f"/api/v1/tasks/{task_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    list_etag = client.get("/api/v1/tasks").headers["ETag"]
+    assert client.get("/api/v1/tasks", headers={"If-None-Match": list_etag}).status_code == 304
+
+    client.patch(f"/api/v1/tasks/{task_id}", json={"status": "doing"})
+    assert client.get(f"/api/v1/tasks/{task_id}", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/api/v1/tasks", headers={"If-None-Match": list_etag}).status_code == 200
+
+
+def test_export_streams_ndjson(client):
+    client.post("/api/v1/tasks", json={"title": "Exported"})
+    r = client.get("/api/v1/tasks:export")
+    assert r.status_code == 200
+    assert r.mimetype == "application/x-ndjson"
+    lines = r.get_data(as_text=True).splitlines()
+    assert len(lines) == client.get("/api/v1/tasks").get_json()["total"]
+    assert "Exported" in lines[-1]
+
+
+def test_fragment_cache_is_lru_bounded():
+    renders = []
+    cache = FragmentCache(lambda t: renders.append(t["id"]) or t["id"].encode(), max_entries=2)
+    a, b, c = ({"id": i, "version": 1} for i in "abc")
+    cache.get(a), cache.get(b), cache.get(a)  # a is now the most recently used
+    cache.get(c)  # over the cap: b goes
+    assert len(cache) == 2 and renders == ["a", "b", "c"]
+    cache.get(a), cache.get(b)
+    assert renders == ["a", "b", "c", "b"]
+    cache.get({"id": "a", "version": 2})  # new version: re-rendered in place
+    assert renders[-1] == "a" and len(cache) == 2
+    assert cache.get({"id": "z", "version": 1}, keep=False) == b"z"  # export path: not stored
+    assert len(cache) == 2
+
+
+def test_negotiate_accept_encoding():
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("gzip;q=0, identity") is None and negotiate(None) is None
+    assert negotiate("*;q=0.5") is not None
+
+
+@pytest.mark.skipif(COMPRESSOR is None, reason="TASK_COMPRESSION=0")
+def test_large_responses_are_compressed_once(client):
+    for i in range(20):
+        client.post("/api/v1/tasks", json={"title": f"Compress me {i}"})
+    plain = client.get("/api/v1/tasks?limit=20")
+    cached = len(COMPRESSOR.cache)
+    r = client.get("/api/v1/tasks?limit=20", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["Content-Encoding"] == "gzip" and r.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(r.get_data()) == plain.get_data()
+    assert int(r.headers["Content-Length"]) < len(plain.get_data()) / 3
+    assert r.headers["ETag"] == "W/" + plain.headers["ETag"] and len(COMPRESSOR.cache) == cached + 1
+
+    again = client.get("/api/v1/tasks?limit=20", headers={"Accept-Encoding": "gzip"})
+    assert again.get_data() == r.get_data() and len(COMPRESSOR.cache) == cached + 1  # reused
+    revalidate = {"Accept-Encoding": "gzip", "If-None-Match": r.headers["ETag"]}
+    assert client.get("/api/v1/tasks?limit=20", headers=revalidate).status_code == 304
+
+    task_id = plain.get_json()["items"][0]["id"]
+    small = client.get(f"/api/v1/tasks/{task_id}", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers  # below min_size
+
+
+def test_idempotency_key_replays_the_original_create(client):
+    headers = {"Idempotency-Key": "retry-me"}
+    total = client.get("/api/v1/tasks").get_json()["total"]
+    first = client.post("/api/v1/tasks", json={"title": "Once"}, headers=headers)
+    retry = client.post("/api/v1/tasks", json={"title": "Once"}, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.get_json() == first.get_json() and retry.headers["Idempotent-Replayed"] == "true"
+    assert client.get("/api/v1/tasks").get_json()["total"] == total + 1
+
+    reused = client.post("/api/v1/tasks", json={"title": "Other"}, headers=headers)
+    assert reused.status_code == 422 and reused.get_json()["error"]["code"] == "IDEMPOTENCY_KEY_REUSED"
+    assert client.post("/api/v1/tasks", json={"title": "No key"}).status_code == 201
+
+
+def test_idempotency_cache_coalesces_concurrent_duplicates():
+    cache = IdempotencyCache(ttl=60)
+    release = threading.Event()
+    calls = []
+
+    def handler():
+        calls.append(1)
+        release.wait(5)
+        return StoredResponse(201, b"{}", ())
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.execute("k", b"body", handler)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1  # one execution, seven waiters
+    assert sorted(replayed for _, replayed in results) == [False] + [True] * 7
+
+    failing = IdempotencyCache()
+    assert failing.execute("k", b"", lambda: StoredResponse(503, b"", ()))[0].status == 503
+    assert len(failing) == 0  # 5xx isn't stored: the retry runs again
+
+
+def test_idempotency_cache_never_evicts_in_flight_keys():
+    cache = IdempotencyCache(ttl=60, max_entries=1)
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return StoredResponse(201, b"slow", ())
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.execute("slow", b"", slow)))
+               for _ in range(2)]
+    threads[0].start()
+    time.sleep(0.05)
+    # Another key fills the cache while "slow" is still running.
+    assert cache.execute("fast", b"", lambda: StoredResponse(201, b"fast", ()))[1] is False
+    threads[1].start()  # duplicate of "slow": must wait for the first one, not run again
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in results) == [False, True]
+    assert all(resp.body == b"slow" for resp, _ in results)
+
+
+def test_wal_replay_rebuilds_the_store(tmp_path):
+    path = str(tmp_path / "tasks.wal")
+    store = open_logged_store(path)
+    now = datetime.utcnow()
+    for task_id, status in (("a", "todo"), ("b", "todo"), ("c", "todo")):
+        store.add({"id": task_id, "title": task_id.upper(), "status": status, "createdAt": now, "updatedAt": now})
+    store.update("b", {"status": "done", "updatedAt": datetime.utcnow()})
+    store.remove("c")
+    store.close()
+
+    with open(path, "ab") as f:
+        f.write(b'["put", "torn')  # crash mid-append
+
+    restarted = open_logged_store(path)
+    assert restarted.get("b")["status"] == "done" and restarted.get("b")["version"] == 2
+    assert "c" not in restarted
+    assert restarted.count("todo") == 1 and restarted.count("done") == 1
+
+
+def test_wal_appends_do_not_wait_for_fsync(tmp_path, monkeypatch):
+    started, release, real_fsync = threading.Event(), threading.Event(), os.fsync
+
+    def slow_fsync(fd):  # a disk that takes as long as we say
+        started.set()
+        release.wait(5)
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", slow_fsync)
+    path = str(tmp_path / "tasks.wal")
+    wal = WriteAheadLog(path, flush_every=1)
+    wal.append_put(TaskRecord("a", "A", "todo", 1, 1))
+    assert started.wait(5)  # the flusher is now inside fsync
+
+    start = time.perf_counter()
+    wal.append_put(TaskRecord("b", "B", "todo", 1, 1))
+    assert time.perf_counter() - start < 1  # buffered, not stuck behind the disk
+    syncer = threading.Thread(target=wal.sync)
+    syncer.start()
+    time.sleep(0.05)
+    assert syncer.is_alive()  # sync() does wait until "b" is on disk
+    release.set()
+    syncer.join(5)
+    assert not syncer.is_alive()
+    wal.close()
+    assert set(replay(path)) == {"a", "b"}
+
+
+def test_snapshot_plus_wal_tail_restart(tmp_path, monkeypatch):
+    snap, wal = str(tmp_path / "tasks.snap"), str(tmp_path / "tasks.wal")
+    store = SnapshotTaskStore(snap, wal)
+    now = datetime.utcnow()
+    for task_id in ("a", "b", "c"):
+        store.add({"id": task_id, "title": task_id.upper(), "status": "todo", "createdAt": now, "updatedAt": now})
+    assert store.save_snapshot() and not store.save_snapshot()  # unchanged -> skipped
+    store.update("a", {"status": "done", "updatedAt": datetime.utcnow()})  # only in the WAL tail
+    store.remove("b")
+    store.close()
+
+    hydrate = threading.Event()
+    full_scan = SnapshotView.__iter__
+
+    def held_scan(view):  # keeps the background hydration from finishing
+        hydrate.wait(5)
+        yield from full_scan(view)
+
+    monkeypatch.setattr(SnapshotView, "__iter__", held_scan)
+    restarted = SnapshotTaskStore(snap, wal)
+    assert restarted.get("c")["title"] == "C"  # served before hydration is needed
+    assert restarted.get("a")["status"] == "done" and restarted.get("b") is None
+    assert not restarted.wait_ready(0)  # still held: counts come from snapshot + tail
+    assert len(restarted) == 2 and (restarted.count("todo"), restarted.count("done")) == (1, 1)
+    hydrate.set()
+    assert restarted.wait_ready(5)
+    assert len(restarted) == 2 and restarted.count("done") == 1
+    restarted.close()
+
+
+def test_snapshot_rotates_the_wal(tmp_path):
+    snap, wal = str(tmp_path / "tasks.snap"), str(tmp_path / "tasks.wal")
+    store = SnapshotTaskStore(snap, wal)
+    now = datetime.utcnow()
+    for i in range(200):
+        store.add({"id": f"t{i}", "title": "x" * 100, "status": "todo", "createdAt": now, "updatedAt": now})
+    _, full = store.checkpoint()  # WAL offset = bytes logged so far
+    assert store.save_snapshot()
+    store.update("t1", {"status": "done", "updatedAt": datetime.utcnow()})
+    store.close()
+    assert os.path.getsize(wal) < full // 10  # only the post-snapshot tail is left
+
+    restarted = SnapshotTaskStore(snap, wal)
+    assert restarted.wait_ready(5)
+    assert len(restarted) == 200 and restarted.get("t1")["status"] == "done"
+    assert restarted.save_snapshot()  # rotating an already rotated log
+    restarted.remove("t2")
+    restarted.close()
+    again = SnapshotTaskStore(snap, wal)
+    assert again.wait_ready(5) and len(again) == 199
+    again.close()
+    with pytest.raises(ValueError):
+        open_logged_store(wal)  # the head of the log now lives in the snapshot
+
+
+def test_overload_middleware_rejects_fast():
+    limiter = ConcurrencyLimiter(initial=2)
+    guarded = Client(WSGIOverloadMiddleware(flask_app.wsgi_app, rate_limiter=RateLimiter(1, burst=2),
+                                            concurrency=limiter))
+    assert [guarded.get("/api/v1/tasks", buffered=True).status_code for _ in range(3)] == [200, 200, 429]
+    r = guarded.get("/api/v1/tasks")
+    assert r.headers["Retry-After"] == "1" and r.get_json()["error"]["code"] == "RATE_LIMITED"
+    assert limiter.inflight == 0  # slots released once the body was sent
+
+    busy = ConcurrencyLimiter(initial=2)
+    assert busy.try_acquire() and busy.try_acquire()  # two requests already in flight
+    r = Client(WSGIOverloadMiddleware(flask_app.wsgi_app, concurrency=busy)).get("/api/v1/tasks")
+    assert r.status_code == 503 and r.get_json()["error"]["code"] == "OVERLOADED"
+
+    queued = Client(WSGIOverloadMiddleware(flask_app.wsgi_app, concurrency=ConcurrencyLimiter(max_queue_delay=0.05)))
+    stale = f"t={time.time() - 1:.3f}"  # proxy says it arrived a second ago
+    assert queued.get("/api/v1/tasks", headers={"X-Request-Start": stale}).status_code == 503
+
+
+@pytest.mark.skipif(METRICS is None, reason="TASK_METRICS=0")
+def test_metrics_endpoint_records_route_templates(client):
+    task_id = client.post("/api/v1/tasks", json={"title": "Measure me"}).get_json()["id"]
+    client.get(f"/api/v1/tasks/{task_id}")
+    client.get("/api/v1/nope")
+
+    r = client.get("/metrics")
+    assert r.status_code == 200 and r.content_type.startswith("text/plain")
+    text = r.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/tasks/<task_id>",status="200"}' in text
+    assert 'route="<unmatched>",status="404"' in text
+    assert task_id not in text  # templates, not raw paths
+    assert "http_requests_in_flight" in text and "http_response_size_bytes_bucket" in text
+
+
+# SQL task API: its engines are created at import, from the environment.
+@pytest.fixture()
+def db_api(tmp_path, monkeypatch):
+    path = tmp_path / "tasks.db"
+    monkeypatch.setenv("DATABASE_URL", f"sqlite+pysqlite:///{path}")
+    # Second, read-only pool on the same file: the read/write split without a replica.
+    monkeypatch.setenv("READ_DATABASE_URL", f"sqlite+pysqlite:///file:{path}?mode=ro&uri=true")
+    monkeypatch.setenv("TASK_BULK_CHUNK_ROWS", "2")
+    sys.modules.pop("day8_flask_db_api", None)
+    module = importlib.import_module("day8_flask_db_api")
+    module.init_db()
+    yield module
+    module.engine.dispose()
+    module.read_engine.dispose()
+    sys.modules.pop("day8_flask_db_api", None)
+
+
+def test_db_cursor_pages_and_maintained_counts(db_api):
+    client = db_api.app.test_client()
+    ids = [client.post("/api/v1/tasks", json={"title": f"T{i}"}).get_json()["id"] for i in range(5)]
+
+    seen, cursor = [], ""
+    while cursor is not None:
+        page = client.get(f"/api/v1/tasks?limit=2&cursor={cursor}").get_json()
+        seen += [t["id"] for t in page["items"]]
+        cursor = page["next_cursor"]
+    assert seen == ids[::-1]  # newest first, nothing skipped or repeated
+
+    full_last = client.get("/api/v1/tasks?limit=5&cursor=").get_json()
+    assert len(full_last["items"]) == 5 and full_last["next_cursor"] is None  # no empty extra page
+
+    for bad in ("not-a-cursor!", base64.urlsafe_b64encode(b"999999999999999999|x").decode()):
+        r = client.get(f"/api/v1/tasks?cursor={bad}")
+        assert r.status_code == 400 and r.get_json()["error"]["code"] == "INVALID_CURSOR"
+
+    def total(status=""):
+        return client.get(f"/api/v1/tasks?status={status}").get_json()["total"]
+
+    assert (total(), total("todo"), total("done")) == (5, 5, 0)
+    client.patch(f"/api/v1/tasks/{ids[0]}", json={"status": "done"})
+    client.patch(f"/api/v1/tasks/{ids[0]}", json={"status": "done"})  # unchanged status: no double count
+    assert (total(), total("todo"), total("done")) == (5, 4, 1)
+    client.delete(f"/api/v1/tasks/{ids[0]}")
+    client.delete(f"/api/v1/tasks/{ids[1]}")
+    assert (total(), total("todo"), total("done")) == (3, 3, 0)
+    assert "total" not in client.get("/api/v1/tasks?total=false").get_json()
+
+
+def test_db_patch_returns_the_updated_row(db_api):
+    client = db_api.app.test_client()
+    created = client.post("/api/v1/tasks", json={"title": "Draft"}).get_json()
+    time.sleep(0.001)
+
+    r = client.patch(f"/api/v1/tasks/{created['id']}", json={"status": "doing"})
+    assert r.status_code == 200
+    patched = r.get_json()
+    assert patched["status"] == "doing" and patched["title"] == "Draft"  # unsent fields kept
+    assert patched["updatedAt"] > created["updatedAt"] and patched["createdAt"] == created["createdAt"]
+    assert client.get(f"/api/v1/tasks/{created['id']}").get_json() == patched
+
+    missing = client.patch("/api/v1/tasks/nope", json={"title": "x"})
+    assert missing.status_code == 404 and missing.get_json()["error"]["code"] == "TASK_NOT_FOUND"
+
+    db_api.PATCH_RETURNING = False  # the UPDATE + SELECT path (dialects without RETURNING)
+    assert client.patch(f"/api/v1/tasks/{created['id']}", json={"title": "Final"}).get_json()["title"] == "Final"
+    assert client.patch("/api/v1/tasks/nope", json={"title": "x"}).status_code == 404
+
+    for body in ([], ["title"], "x", 3):  # valid JSON, but not an object
+        for r in (client.patch(f"/api/v1/tasks/{created['id']}", json=body),
+                  client.post("/api/v1/tasks", json=body)):
+            assert r.status_code == 400 and r.get_json()["error"]["code"] == "VALIDATION_ERROR"
+
+
+def test_db_bulk_import_json_and_ndjson(db_api):  # the fixture sets 2 rows per chunk
+    client = db_api.app.test_client()
+
+    def total():
+        return client.get("/api/v1/tasks").get_json()["total"]
+
+    r = client.post("/api/v1/tasks:bulk", json=[{"title": "A"}, {"title": "B", "status": "done"}, {"title": "C"}])
+    assert r.status_code == 201 and r.get_json() == {"inserted": 3}
+    assert [t["title"] for t in client.get("/api/v1/tasks").get_json()["items"]] == ["C", "B", "A"]
+    assert client.get("/api/v1/tasks?status=done").get_json()["total"] == 1
+
+    # JSON array: validated up front, all or nothing.
+    r = client.post("/api/v1/tasks:bulk", json=[{"title": "D"}, {"title": "E"}, {"title": " "}])
+    assert r.status_code == 400
+    assert r.get_json()["error"]["details"] == {
+        "errors": [{"index": 2, "message": "Field 'title' is required and must be non-empty"}], "inserted": 0}
+    assert total() == 3
+    assert client.post("/api/v1/tasks:bulk", json={"title": "not a list"}).status_code == 400
+
+    # NDJSON: validated per chunk; chunks before the bad one stay committed.
+    lines = b'{"title": "F"}\n{"title": "G"}\n\n{"title": "H"}\nnot json\n{"title": "I"}\n'
+    r = client.post("/api/v1/tasks:bulk", data=lines, content_type="application/x-ndjson")
+    assert r.status_code == 400
+    details = r.get_json()["error"]["details"]
+    assert details["inserted"] == 2 and details["errors"] == [{"index": 4, "message": "Line is not valid JSON"}]
+    assert total() == 5  # F and G; H was in the rejected chunk, I never read
+
+    r = client.post("/api/v1/tasks:bulk", data=b'{"title": "J"}\n{"title": "K"}', content_type="application/x-ndjson")
+    assert r.status_code == 201 and r.get_json() == {"inserted": 2}  # last line without "\n" counts
+    assert total() == 7
+
+
+def test_db_reads_stick_to_the_primary_after_a_write(db_api):
+    from sqlalchemy import event
+
+    assert db_api.read_engine is not db_api.engine
+    served_by = []
+    event.listen(db_api.engine, "checkout", lambda *args: served_by.append("primary"))
+    event.listen(db_api.read_engine, "checkout", lambda *args: served_by.append("read"))
+
+    def read_with(client):
+        served_by.clear()
+        assert client.get("/api/v1/tasks").status_code == 200
+        return served_by[:]
+
+    writer, other = db_api.app.test_client(), db_api.app.test_client()
+    r = writer.post("/api/v1/tasks", json={"title": "Mine"})
+    assert db_api.STICKY_COOKIE in r.headers["Set-Cookie"]
+    assert read_with(writer) == ["primary"]  # read-your-writes
+    assert read_with(other) == ["read"]  # no recent write: the read pool
+
+    failed = other.post("/api/v1/tasks", json={})
+    assert failed.status_code == 400 and "Set-Cookie" not in failed.headers  # failed writes don't stick
+
+    writer.set_cookie(db_api.STICKY_COOKIE, f"{time.time() - 1:.3f}")  # window over
+    assert read_with(writer) == ["read"]
+    assert other.get("/health/db").get_json() == {"status": "ok", "engines": ["primary", "read"]}
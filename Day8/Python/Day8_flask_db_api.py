@@ -13,6 +13,9 @@ INSTALL
 ------------------------------------------------------------
 pip install flask sqlalchemy
 
+# Optional faster JSON encoding (used automatically when installed):
+pip install orjson
+
 # Optional PostgreSQL driver:
 pip install psycopg2-binary
 
@@ -36,13 +39,20 @@ python day8_flask_db_api.py
 
 from __future__ import annotations
 
+import math
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from uuid import uuid4
 
 from flask import Flask, request, jsonify
 from sqlalchemy import create_engine, text
 
+from api_utils import IdempotencyCache, decode_cursor, encode_cursor, jsonenc
+from api_utils.flask_idempotency import idempotent
+from api_utils.flask_json import FastJSONProvider
+from api_utils.sqlite_profile import apply_sqlite_profile
+
 # ============================================================
 # DB CONFIG
 # ============================================================
@@ -54,7 +64,64 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+pysqlite:///./tasks.db")
 # future=True uses SQLAlchemy 2.0 style.
 engine = create_engine(DATABASE_URL, future=True)
 
+# SQLite only: PRAGMAs run on every new pooled connection.
+# SQLITE_PROFILE=balanced (default: WAL + synchronous=NORMAL + mmap/cache +
+# busy_timeout), durable (same, fsync every commit) or off (SQLite defaults).
+# See api_utils/sqlite_profile.py. Ignored for PostgreSQL.
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "balanced")
+apply_sqlite_profile(engine, SQLITE_PROFILE)
+
+# READ/WRITE SPLIT
+# - `engine` (primary): every write, and reads that must see them
+# - `read_engine`: GET routes; READ_DATABASE_URL = a replica, or for SQLite
+#   a second pool opened read-only on the same file (WAL lets it read while
+#   the primary writes):
+#     READ_DATABASE_URL="sqlite+pysqlite:///file:./tasks.db?mode=ro&uri=true"
+#   Unset = one engine for everything (same as before).
+# - read-your-writes: a replica lags behind the primary, so after a client
+#   writes, its reads stay on the primary for READ_STICKY_SECONDS (default 5),
+#   tracked by a cookie (works across worker processes, no server state)
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+read_engine = create_engine(READ_DATABASE_URL, future=True) if READ_DATABASE_URL else engine
+if read_engine is not engine:
+    apply_sqlite_profile(read_engine, SQLITE_PROFILE)
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", "5"))
+STICKY_COOKIE = "primary_until"
+
 app = Flask(__name__)
+# Faster jsonify(): orjson when installed, stdlib json otherwise.
+app.json = FastJSONProvider(app)
+
+
+def reader():
+    """Engine for this GET: the primary while the client's write may not have replicated yet."""
+    if read_engine is engine:
+        return engine
+    try:
+        if float(request.cookies.get(STICKY_COOKIE, "0")) > time.time():
+            return engine
+    except ValueError:
+        pass
+    return read_engine
+
+
+@app.after_request
+def stick_to_primary_after_write(response):
+    if read_engine is not engine and request.method in ("POST", "PATCH", "PUT", "DELETE") \
+            and response.status_code < 400:
+        response.set_cookie(STICKY_COOKIE, f"{time.time() + READ_STICKY_SECONDS:.3f}",
+                            max_age=int(math.ceil(READ_STICKY_SECONDS)), httponly=True, samesite="Lax")
+    return response
+
+
+# Idempotency-Key on POST /api/v1/tasks (same knobs as the in-memory apps:
+# TASK_IDEMPOTENCY_TTL seconds, TASK_IDEMPOTENCY_MAX keys).
+# NOTE: the cache is per process. With several workers a retry can land on
+# another one; a table of keys (INSERT ... ON CONFLICT) would dedupe those too.
+IDEMPOTENCY = IdempotencyCache(
+    ttl=float(os.getenv("TASK_IDEMPOTENCY_TTL", "86400")),
+    max_entries=int(os.getenv("TASK_IDEMPOTENCY_MAX", "100000")),
+)
 
 # ============================================================
 # DB SCHEMA (simple tasks table)
@@ -70,9 +137,81 @@ CREATE TABLE IF NOT EXISTS tasks (
 );
 """
 
+# Indexes for the hot queries (see list_sql()):
+# - WHERE status = ? ORDER BY created_at DESC, id DESC -> (status, created_at, id):
+#   jump to the status, read it already sorted, stop after LIMIT rows
+# - ORDER BY created_at DESC, id DESC (no filter)       -> (created_at, id)
+# `id` is the tie-break of the keyset cursor, so it's in the index too.
+# Without them every list call is a full table scan + a sort of all rows.
+# Changing an index? Add it under a NEW name and list the old name in
+# RETIRED_INDEXES, so existing databases get migrated on startup.
+INDEXES = {
+    "ix_tasks_status_created_id":
+        "CREATE INDEX IF NOT EXISTS ix_tasks_status_created_id ON tasks (status, created_at, id)",
+    "ix_tasks_created_id": "CREATE INDEX IF NOT EXISTS ix_tasks_created_id ON tasks (created_at, id)",
+}
+RETIRED_INDEXES: tuple[str, ...] = ()
+
+def ensure_indexes(conn) -> None:
+    for name in RETIRED_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    for ddl in INDEXES.values():
+        conn.execute(text(ddl))
+
+# Row counts kept up to date by triggers (same idea as api_utils/shared_store.py),
+# so `total` is a one-row lookup instead of COUNT(*) over the table (or over
+# one status) on every list call. '*' = all tasks.
+# Triggers are per dialect; on other backends total falls back to COUNT(*).
+STATUSES = ("todo", "doing", "done")
+COUNTS_SQL = "CREATE TABLE IF NOT EXISTS task_counts (status TEXT PRIMARY KEY, n BIGINT NOT NULL)"
+COUNT_TRIGGERS = {
+    "sqlite": [
+        """CREATE TRIGGER IF NOT EXISTS tr_task_counts_ins AFTER INSERT ON tasks BEGIN
+             UPDATE task_counts SET n = n + 1 WHERE status IN ('*', NEW.status);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS tr_task_counts_del AFTER DELETE ON tasks BEGIN
+             UPDATE task_counts SET n = n - 1 WHERE status IN ('*', OLD.status);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS tr_task_counts_status AFTER UPDATE OF status ON tasks
+           WHEN OLD.status <> NEW.status BEGIN
+             UPDATE task_counts SET n = n - 1 WHERE status = OLD.status;
+             UPDATE task_counts SET n = n + 1 WHERE status = NEW.status;
+           END""",
+    ],
+    "postgresql": [
+        """CREATE OR REPLACE FUNCTION task_counts_trg() RETURNS trigger AS $$
+           BEGIN
+             IF TG_OP = 'UPDATE' AND OLD.status = NEW.status THEN RETURN NULL; END IF;
+             IF TG_OP <> 'INSERT' THEN UPDATE task_counts SET n = n - 1 WHERE status IN ('*', OLD.status); END IF;
+             IF TG_OP <> 'DELETE' THEN UPDATE task_counts SET n = n + 1 WHERE status IN ('*', NEW.status); END IF;
+             RETURN NULL;
+           END $$ LANGUAGE plpgsql""",
+        "DROP TRIGGER IF EXISTS tr_task_counts ON tasks",
+        """CREATE TRIGGER tr_task_counts AFTER INSERT OR DELETE OR UPDATE OF status ON tasks
+           FOR EACH ROW EXECUTE FUNCTION task_counts_trg()""",
+    ],
+}
+MAINTAINED_COUNTS = engine.dialect.name in COUNT_TRIGGERS
+
+def ensure_counts(conn) -> None:
+    """Create the counts table + triggers; fill it once from the table if it's new."""
+    if not MAINTAINED_COUNTS:
+        return
+    conn.execute(text(COUNTS_SQL))
+    for ddl in COUNT_TRIGGERS[engine.dialect.name]:
+        conn.execute(text(ddl))
+    if conn.execute(text("SELECT 1 FROM task_counts WHERE status = '*'")).first() is None:
+        for status in ("*", *STATUSES):
+            conn.execute(text("DELETE FROM task_counts WHERE status = :s"), {"s": status})
+            conn.execute(text(f"INSERT INTO task_counts (status, n) SELECT :s, COUNT(*) FROM tasks"
+                              f"{'' if status == '*' else ' WHERE status = :s'}"), {"s": status})
+
 def init_db():
     with engine.begin() as conn:
         conn.execute(text(SCHEMA_SQL))
+        ensure_indexes(conn)
+        ensure_counts(conn)
+    check_query_plans()
 
 def error_response(status: int, code: str, message: str, details: dict | None = None):
     return jsonify({"error": {"code": code, "message": message, "details": details or {}}}), status
@@ -89,43 +228,102 @@ def row_to_task(r: dict) -> dict:
 # ============================================================
 # ROUTES
 # ============================================================
+ORDER_BY = " ORDER BY created_at DESC, id DESC LIMIT :limit"
+# Shared by POST /api/v1/tasks and the bulk import (executemany).
+INSERT_SQL = "INSERT INTO tasks (id,title,status,created_at,updated_at) VALUES (:id,:t,:s,:c,:u)"
+
+def list_sql(status: str | None, after: bool = False) -> str:
+    """
+    Offset mode: LIMIT/OFFSET (the database still walks every skipped row).
+    Keyset mode (after=True): continue below the last row of the previous
+    page, so page 5000 costs the same as page 1.
+    """
+    where = ["status = :status"] if status else []
+    if after:
+        where.append("(created_at, id) < (:after_created, :after_id)")
+    sql = "SELECT * FROM tasks" + (" WHERE " + " AND ".join(where) if where else "") + ORDER_BY
+    return sql if after else sql + " OFFSET :offset"
+
+def count_sql(status: str | None) -> str:
+    if MAINTAINED_COUNTS:
+        return "SELECT COALESCE(SUM(n), 0) AS c FROM task_counts WHERE status = :status"
+    return "SELECT COUNT(*) AS c FROM tasks" + (" WHERE status = :status" if status else "")
+
+def count_tasks(conn, status: str | None) -> int:
+    if MAINTAINED_COUNTS:
+        return conn.execute(text(count_sql(status)), {"status": status or "*"}).scalar_one()
+    return conn.execute(text(count_sql(status)), {"status": status} if status else {}).scalar_one()
+
+def created_us(created_at: str) -> int:
+    """ISO text (as stored) -> epoch microseconds, the cursor's time part."""
+    dt = datetime.fromisoformat(created_at)
+    return (dt - datetime(1970, 1, 1)) // timedelta(microseconds=1)
+
+def created_iso(us: int) -> str:
+    """Inverse of created_us(); same text as datetime.isoformat() wrote it."""
+    return (datetime(1970, 1, 1) + timedelta(microseconds=us)).isoformat()
+
 @app.get("/api/v1/tasks")
 def list_tasks():
+    """
+    - offset mode: ?limit=50&offset=0 (kept for backward compatibility)
+    - keyset mode: ?cursor= (first page), then ?cursor=<next_cursor>
+    - ?total=false skips the count (cheap anyway when counts are maintained)
+    """
     status = request.args.get("status")
     limit = request.args.get("limit", type=int) or 50
     offset = request.args.get("offset", type=int) or 0
+    cursor = request.args.get("cursor")
+    with_total = request.args.get("total", "true").lower() not in ("0", "false", "no")
 
-    sql = "SELECT * FROM tasks"
-    params = {}
+    # Keyset mode reads one row past the page: a next_cursor only when it exists,
+    # so an exactly full last page does not cost the client an empty round trip.
+    params = {"limit": limit if cursor is None else limit + 1}
     if status:
-        sql += " WHERE status = :status"
         params["status"] = status
-    sql += " ORDER BY created_at DESC LIMIT :limit OFFSET :offset"
-    params["limit"] = limit
-    params["offset"] = offset
-
-    with engine.connect() as conn:
-        rows = conn.execute(text(sql), params).mappings().all()
-
-        # total count (for pagination UI)
-        count_sql = "SELECT COUNT(*) AS c FROM tasks"
-        if status:
-            count_sql += " WHERE status = :status"
-        total = conn.execute(text(count_sql), {"status": status} if status else {}).mappings().first()["c"]
-
-    return jsonify({"items": [row_to_task(dict(r)) for r in rows], "total": total, "limit": limit, "offset": offset})
+    if cursor:
+        try:
+            after_us, after_id = decode_cursor(cursor)
+            after_created = created_iso(after_us)
+        except ValueError as e:
+            return error_response(400, "INVALID_CURSOR", str(e))
+        except OverflowError:  # well-formed token, time far outside datetime's range
+            return error_response(400, "INVALID_CURSOR", f"Invalid cursor: {cursor!r}")
+        params.update(after_created=after_created, after_id=after_id)
+    else:
+        params["offset"] = offset if cursor is None else 0  # cursor="" = first keyset page
+
+    with reader().connect() as conn:
+        rows = conn.execute(text(list_sql(status, after=bool(cursor))), params).mappings().all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        # total count (for pagination UI): a lookup in task_counts
+        total = count_tasks(conn, status) if with_total else None
+
+    body = {"items": [row_to_task(dict(r)) for r in rows], "limit": limit}
+    if with_total:
+        body["total"] = total
+    if cursor is None:
+        body["offset"] = offset
+    else:
+        last = rows[-1] if has_more else None
+        body["next_cursor"] = encode_cursor((created_us(last["created_at"]), last["id"])) if last else None
+    return jsonify(body)
 
 @app.get("/api/v1/tasks/<task_id>")
 def get_task(task_id: str):
-    with engine.connect() as conn:
+    with reader().connect() as conn:
         row = conn.execute(text("SELECT * FROM tasks WHERE id=:id"), {"id": task_id}).mappings().first()
     if not row:
         return error_response(404, "TASK_NOT_FOUND", f"Task '{task_id}' not found")
     return jsonify(row_to_task(dict(row)))
 
 @app.post("/api/v1/tasks")
+@idempotent(IDEMPOTENCY, error_response)
 def create_task():
-    data = request.get_json(silent=True) or {}
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return error_response(400, "VALIDATION_ERROR", "Body must be JSON object")
     title = data.get("title")
     if not isinstance(title, str) or not title.strip():
         return error_response(400, "VALIDATION_ERROR", "Field 'title' is required and must be non-empty")
@@ -137,37 +335,153 @@ def create_task():
     # engine.begin() = transaction (commit on success, rollback on exception)
     with engine.begin() as conn:
         conn.execute(
-            text("INSERT INTO tasks (id,title,status,created_at,updated_at) VALUES (:id,:t,:s,:c,:u)"),
+            text(INSERT_SQL),
             {"id": task["id"], "t": task["title"], "s": task["status"], "c": task["created_at"], "u": task["updated_at"]},
         )
 
     return jsonify(row_to_task(task)), 201
 
+# ============================================================
+# BULK IMPORT
+# ============================================================
+# WHY: importing 100k tasks through POST /api/v1/tasks = 100k requests,
+# 100k transactions, 100k commits (fsync). Here:
+# - rows are validated, then inserted with executemany (one prepared
+#   statement, many parameter sets) in ONE transaction per chunk
+# - chunk size: TASK_BULK_CHUNK_ROWS (default 5000) bounds the memory held
+#   and how long one transaction keeps the write lock
+# Body: a JSON array, or NDJSON (Content-Type: application/x-ndjson, one
+# task per line) which is read line by line, so a huge import never has to
+# fit in memory.
+# Errors: a JSON array is validated completely first (all or nothing).
+# NDJSON stops at the first chunk with an invalid row: earlier chunks stay
+# committed and the 400 says how many rows were inserted.
+# NOTE: no Idempotency-Key here (fingerprinting would buffer the whole
+# stream); a failed NDJSON import resumes after details.inserted rows.
+BULK_CHUNK_ROWS = int(os.getenv("TASK_BULK_CHUNK_ROWS", "5000"))
+MAX_BULK_ERRORS = 100  # listed in the 400; the rest are only counted
+
+def validate_bulk_row(row) -> str | None:
+    if not isinstance(row, dict):
+        return "Row must be a JSON object"
+    title = row.get("title")
+    if not isinstance(title, str) or not title.strip():
+        return "Field 'title' is required and must be non-empty"
+    if row.get("status", "todo") not in STATUSES:
+        return "status must be one of todo/doing/done"
+    return None
+
+def ndjson_rows(block_size: int = 64 * 1024):
+    """
+    Yield (line index, parsed row or None if the line isn't JSON).
+    Reads the body in 64 KiB blocks (iterating the stream line by line
+    costs a Python call per line, ~2x slower) without ever holding it all.
+    """
+    index, pending = 0, b""
+    while True:
+        block = request.stream.read(block_size)
+        lines = (pending + block).split(b"\n")
+        pending = lines.pop() if block else b""
+        for line in lines:
+            if line.strip():
+                try:
+                    yield index, jsonenc.loads(line)
+                except ValueError:
+                    yield index, None
+            index += 1
+        if not block:
+            return
+
+def bulk_chunks(rows):
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= BULK_CHUNK_ROWS:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def row_errors(rows) -> list[dict]:
+    return [{"index": index, "message": err} for index, row in rows
+            if (err := "Line is not valid JSON" if row is None else validate_bulk_row(row))]
+
+def bulk_error(errors: list[dict], inserted: int):
+    return error_response(400, "VALIDATION_ERROR", f"{len(errors)} invalid row(s)",
+                          {"errors": errors[:MAX_BULK_ERRORS], "inserted": inserted})
+
+@app.post("/api/v1/tasks:bulk")
+def bulk_create_tasks():
+    ndjson = request.mimetype == "application/x-ndjson"
+    if ndjson:
+        rows = ndjson_rows()
+    else:
+        body = request.get_json(silent=True)
+        if not isinstance(body, list) or not body:
+            return error_response(400, "VALIDATION_ERROR",
+                                  "Body must be a non-empty JSON array of tasks (or NDJSON as application/x-ndjson)")
+        rows = list(enumerate(body))
+        errors = row_errors(rows)
+        if errors:
+            return bulk_error(errors, 0)
+
+    base = datetime.utcnow()
+    inserted = 0
+    for chunk in bulk_chunks(rows):
+        if ndjson:
+            errors = row_errors(chunk)
+            if errors:
+                return bulk_error(errors, inserted)
+        params = []
+        for offset, (_, row) in enumerate(chunk, start=inserted):
+            # One microsecond apart: imported rows keep their order in the list.
+            ts = (base + timedelta(microseconds=offset)).isoformat()
+            params.append({"id": str(uuid4()), "t": row["title"].strip(), "s": row.get("status", "todo"),
+                           "c": ts, "u": ts})
+        with engine.begin() as conn:
+            conn.execute(text(INSERT_SQL), params)  # list of dicts = executemany
+        inserted += len(params)
+    return jsonify({"inserted": inserted}), 201
+
+# PATCH = ONE statement in ONE transaction:
+# - COALESCE(:t, title) keeps fields the client didn't send, so no prior
+#   SELECT is needed (one round trip, and no window where another request
+#   changes the row between our read and our write)
+# - RETURNING hands back the updated row (SQLite >= 3.35, PostgreSQL);
+#   elsewhere a SELECT follows the UPDATE in the SAME transaction, where
+#   the row is already write-locked by us
+PATCH_SQL = """UPDATE tasks SET title = COALESCE(:t, title), status = COALESCE(:s, status), updated_at = :u
+WHERE id = :id"""
+# (dialect.update_returning is SQLAlchemy 2.0+; on 1.4 use UPDATE + SELECT.)
+PATCH_RETURNING = getattr(engine.dialect, "update_returning", False)
+
 @app.patch("/api/v1/tasks/<task_id>")
 def patch_task(task_id: str):
-    data = request.get_json(silent=True) or {}
+    data = request.get_json(silent=True)
+    data = {} if data is None else data  # not `or {}`: that would let [] through as {}
+    if not isinstance(data, dict):  # a JSON array/scalar has no .get()
+        return error_response(400, "VALIDATION_ERROR", "Body must be JSON object")
     if "status" in data and data["status"] not in {"todo", "doing", "done"}:
         return error_response(400, "VALIDATION_ERROR", "status must be one of todo/doing/done")
     if "title" in data and (not isinstance(data["title"], str) or not data["title"].strip()):
         return error_response(400, "VALIDATION_ERROR", "title must be non-empty string")
 
-    # read current
-    with engine.connect() as conn:
-        current = conn.execute(text("SELECT * FROM tasks WHERE id=:id"), {"id": task_id}).mappings().first()
-    if not current:
-        return error_response(404, "TASK_NOT_FOUND", f"Task '{task_id}' not found")
-
-    new_title = data.get("title", current["title"])
-    new_status = data.get("status", current["status"])
-    now = datetime.utcnow().isoformat()
-
+    params = {
+        "t": data["title"].strip() if "title" in data else None,
+        "s": data.get("status"),
+        "u": datetime.utcnow().isoformat(),
+        "id": task_id,
+    }
     with engine.begin() as conn:
-        conn.execute(
-            text("UPDATE tasks SET title=:t, status=:s, updated_at=:u WHERE id=:id"),
-            {"t": new_title.strip(), "s": new_status, "u": now, "id": task_id},
-        )
-
-    return jsonify({"id": task_id, "title": new_title.strip(), "status": new_status, "createdAt": current["created_at"], "updatedAt": now})
+        if PATCH_RETURNING:
+            row = conn.execute(text(PATCH_SQL + " RETURNING *"), params).mappings().first()
+        else:
+            updated = conn.execute(text(PATCH_SQL), params).rowcount
+            row = conn.execute(text("SELECT * FROM tasks WHERE id=:id"), {"id": task_id}).mappings().first() \
+                if updated else None
+    if not row:
+        return error_response(404, "TASK_NOT_FOUND", f"Task '{task_id}' not found")
+    return jsonify(row_to_task(dict(row)))
 
 @app.delete("/api/v1/tasks/<task_id>")
 def delete_task(task_id: str):
@@ -177,14 +491,65 @@ def delete_task(task_id: str):
         return error_response(404, "TASK_NOT_FOUND", f"Task '{task_id}' not found")
     return "", 204
 
+# ============================================================
+# STARTUP SELF-CHECK: query plans of the hot queries
+# ============================================================
+# WHY: a missing/dropped index doesn't break anything, it just makes
+# every list call slow. EXPLAIN shows it at startup instead of in prod.
+HOT_QUERIES = {
+    "list": (list_sql(None), {"limit": 50, "offset": 0}),
+    "list by status": (list_sql("todo"), {"status": "todo", "limit": 50, "offset": 0}),
+    "list after cursor": (list_sql(None, after=True), {"limit": 50, "after_created": "", "after_id": ""}),
+    "list by status after cursor": (list_sql("todo", after=True),
+                                    {"status": "todo", "limit": 50, "after_created": "", "after_id": ""}),
+    "count by status": (count_sql("todo"), {"status": "todo"}),
+    "get by id": ("SELECT * FROM tasks WHERE id=:id", {"id": "x"}),
+}
+
+def plan_problems(plan: list[str], dialect: str) -> list[str]:
+    """
+    SQLite: "SCAN tasks" without an index = full table scan;
+    "USE TEMP B-TREE FOR ORDER BY" = sorting every matching row.
+    (A "SCAN tasks USING INDEX" is fine: rows come in order, LIMIT stops it.)
+    PostgreSQL: "Seq Scan" / "Sort", checked with seq scans disabled so a
+    small table doesn't hide a missing index.
+    """
+    if dialect == "sqlite":
+        return [line for line in plan
+                if (line.startswith("SCAN ") and "INDEX" not in line) or "TEMP B-TREE" in line]
+    nodes = [line.strip().removeprefix("->").strip() for line in plan]
+    return [node for node in nodes if node.startswith(("Seq Scan", "Sort  ("))]
+
+def check_query_plans() -> dict[str, list[str]]:
+    """Log a warning for every hot query whose plan scans or sorts; returns {query: problems}."""
+    dialect = engine.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        return {}
+    found = {}
+    with engine.begin() as conn:
+        if dialect == "postgresql":
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+        for name, (sql, params) in HOT_QUERIES.items():
+            if dialect == "sqlite":
+                plan = [row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql), params)]
+            else:
+                plan = [row[0] for row in conn.execute(text("EXPLAIN " + sql), params)]
+            problems = plan_problems(plan, dialect)
+            if problems:
+                found[name] = problems
+                app.logger.warning("query plan check: %r falls back to %s", name, "; ".join(problems))
+    return found
+
 @app.get("/health/db")
 def health_db():
-    try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        return jsonify({"status": "ok"})
-    except Exception as e:
-        return error_response(500, "DB_ERROR", "Database not reachable", {"reason": str(e)})
+    engines = {"primary": engine} if read_engine is engine else {"primary": engine, "read": read_engine}
+    for name, eng in engines.items():
+        try:
+            with eng.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except Exception as e:
+            return error_response(500, "DB_ERROR", "Database not reachable", {"engine": name, "reason": str(e)})
+    return jsonify({"status": "ok", "engines": list(engines)})
 
 
 if __name__ == "__main__":
@@ -9,6 +9,9 @@ INSTALL
 ------------------------------------------------------------
 pip install flask
 
+# Optional faster JSON encoding (used automatically when installed):
+pip install orjson
+
 ------------------------------------------------------------
 RUN
 ------------------------------------------------------------
@@ -20,14 +23,26 @@ Then open:
 Try with curl:
 - curl -s http://127.0.0.1:5000/api/v1/tasks | python -m json.tool
 - curl -s -X POST http://127.0.0.1:5000/api/v1/tasks -H "Content-Type: application/json" -d '{"title":"Buy milk"}'
+- curl -s http://127.0.0.1:5000/api/v1/tasks:export          (NDJSON, one task per line)
 """
 
 from __future__ import annotations
 
-from flask import Flask, request, jsonify
+import os
+
+from flask import Flask, Request, Response, request, jsonify
 from datetime import datetime
 from uuid import uuid4
 
+from api_utils import (
+    ROUTE_KEY, SORT_OPTIONS, CompressedCache, Compressor, ConcurrencyLimiter, FragmentCache,
+    IdempotencyCache, Metrics, RateLimiter, SqliteTaskStore, TaskStore, WSGICompressionMiddleware, WSGIMetricsMiddleware,
+    WSGIOverloadMiddleware, decode_cursor, encode_cursor, jsonenc, list_etag, open_logged_store,
+    scan_tasks, task_etag,
+)
+from api_utils.flask_idempotency import idempotent
+from api_utils.flask_json import FastJSONProvider
+
 # ============================================================
 # WHAT: REST API mental model
 # ============================================================
@@ -42,11 +57,112 @@ from uuid import uuid4
 # WHEN: Internal services, mobile apps, partner integrations.
 
 app = Flask(__name__)
+# JSON encoding goes through api_utils.jsonenc: orjson when installed,
+# stdlib json otherwise (API_JSON_BACKEND=json forces stdlib).
+app.json = FastJSONProvider(app)
 
 # In-memory storage for training.
 # NOTE: In production, you would use a database. In-memory resets on restart,
 # and is NOT safe across multiple worker processes.
-TASKS: dict[str, dict] = {}
+# TaskStore = dict of tasks + a per-status index (see api_utils/store.py),
+# so `?status=done` does not scan every task.
+#
+# Multiple worker processes (gunicorn -w 4 ...)?
+# Set TASK_STORE_PATH=tasks_shared.db and every worker on this host shares
+# one SQLite (WAL mode) file instead of a private dict per process.
+#
+# Survive restarts without a database?
+# Set TASK_WAL_PATH=tasks.wal: every write is appended to a log (group-commit
+# fsync every TASK_WAL_FLUSH_MS ms or TASK_WAL_FLUSH_EVERY writes) and the
+# store is rebuilt from it on startup. See api_utils/wal.py.
+TASK_STORE_PATH = os.getenv("TASK_STORE_PATH")
+TASK_WAL_PATH = os.getenv("TASK_WAL_PATH")
+if TASK_STORE_PATH:
+    TASKS = SqliteTaskStore(TASK_STORE_PATH)
+elif TASK_WAL_PATH:
+    TASKS = open_logged_store(
+        TASK_WAL_PATH,
+        flush_interval=float(os.getenv("TASK_WAL_FLUSH_MS", "5")) / 1000,
+        flush_every=int(os.getenv("TASK_WAL_FLUSH_EVERY", "256")),
+    )
+else:
+    TASKS = TaskStore()
+
+# Response compression (on by default, TASK_COMPRESSION=0 turns it off):
+# gzip, or brotli / zstd when installed, as the client's Accept-Encoding allows.
+# - only bodies >= TASK_COMPRESS_MIN_BYTES (default 1024): a single task is
+#   ~150 bytes and gains nothing, a 200-task page shrinks 5-10x
+# - responses with an ETag keep their compressed bytes (TASK_COMPRESS_CACHE
+#   entries, LRU), so a polled page is compressed once per data version
+# Innermost middleware: overload refusals stay tiny, metrics see wire sizes.
+COMPRESSOR = Compressor(
+    min_size=int(os.getenv("TASK_COMPRESS_MIN_BYTES", "1024")),
+    cache=CompressedCache(int(os.getenv("TASK_COMPRESS_CACHE", "1024"))),
+) if os.getenv("TASK_COMPRESSION", "1") != "0" else None
+if COMPRESSOR is not None:
+    app.wsgi_app = WSGICompressionMiddleware(app.wsgi_app, COMPRESSOR)
+
+# Overload protection (off unless configured), checked before Flask routing:
+# - TASK_RATE_LIMIT=<req/s> per client IP (+ TASK_RATE_BURST) -> 429
+# - TASK_CONCURRENCY_LIMIT=<n> starting in-flight cap, adapted to keep
+#   latency under TASK_TARGET_LATENCY_MS -> 503 instead of a growing queue
+#   (also 503 when the proxy's X-Request-Start says the request already
+#   waited more than TASK_MAX_QUEUE_MS before reaching the app)
+# Both answers carry Retry-After. See api_utils/overload.py.
+TASK_RATE_LIMIT = float(os.getenv("TASK_RATE_LIMIT", "0"))
+TASK_CONCURRENCY_LIMIT = int(os.getenv("TASK_CONCURRENCY_LIMIT", "0"))
+if TASK_RATE_LIMIT or TASK_CONCURRENCY_LIMIT:
+    app.wsgi_app = WSGIOverloadMiddleware(
+        app.wsgi_app,
+        rate_limiter=RateLimiter(TASK_RATE_LIMIT, float(os.getenv("TASK_RATE_BURST", "0")) or None)
+        if TASK_RATE_LIMIT else None,
+        concurrency=ConcurrencyLimiter(
+            TASK_CONCURRENCY_LIMIT,
+            target_latency=float(os.getenv("TASK_TARGET_LATENCY_MS", "50")) / 1000,
+            max_queue_delay=float(os.getenv("TASK_MAX_QUEUE_MS", "50")) / 1000,
+        ) if TASK_CONCURRENCY_LIMIT else None,
+        exempt_paths=("/metrics",),
+    )
+
+# Metrics (on by default, TASK_METRICS=0 turns them off): per-route latency
+# and size histograms + an in-flight gauge, scraped at GET /metrics.
+# Installed last = outermost, so 429/503 refusals are counted too.
+METRICS = Metrics() if os.getenv("TASK_METRICS", "1") != "0" else None
+
+
+class RouteLabelRequest(Request):
+    """
+    Metrics are labelled by route TEMPLATE (/api/v1/tasks/<task_id>), never
+    the raw path. Flask sets request.url_rule once while routing; this setter
+    copies the template into the WSGI environ for the middleware. Cheaper
+    than a before_request hook (~0.3 us vs ~4 us per request).
+    """
+
+    _url_rule = None
+
+    @property
+    def url_rule(self):
+        return self._url_rule
+
+    @url_rule.setter
+    def url_rule(self, rule):
+        self._url_rule = rule
+        if rule is not None:
+            self.environ[ROUTE_KEY] = rule.rule
+
+
+if METRICS is not None:
+    app.request_class = RouteLabelRequest
+    app.wsgi_app = WSGIMetricsMiddleware(app.wsgi_app, METRICS)
+
+# Idempotency-Key on creates: a client that retries POST after a timeout
+# sends the same key and gets the original 201 back instead of a duplicate
+# task. Responses are kept TASK_IDEMPOTENCY_TTL seconds (default 24h), at
+# most TASK_IDEMPOTENCY_MAX keys. See api_utils/idempotency.py.
+IDEMPOTENCY = IdempotencyCache(
+    ttl=float(os.getenv("TASK_IDEMPOTENCY_TTL", "86400")),
+    max_entries=int(os.getenv("TASK_IDEMPOTENCY_MAX", "100000")),
+)
 
 # -----------------------------
 # Helpers: consistent errors
@@ -71,6 +187,53 @@ def serialize_task(task: dict) -> dict:
         "updatedAt": task["updatedAt"].isoformat(),
     }
 
+def render_task_json(task: dict) -> bytes:
+    return jsonenc.dumps_bytes(serialize_task(task))
+
+# Serialized-response cache:
+# - one encoded JSON fragment per task, reused until the task's version changes
+# - TASK_SERIALIZE_CACHE=0 turns it off (handy for benchmarks/debugging)
+# - TASK_FRAGMENT_CACHE caps how many fragments are kept (LRU)
+SERIALIZE_CACHE = os.getenv("TASK_SERIALIZE_CACHE", "1") != "0"
+TASK_JSON = FragmentCache(render_task_json, int(os.getenv("TASK_FRAGMENT_CACHE", "100000")))
+
+def list_response(tasks: list[dict], meta: dict, etag: str):
+    """
+    WHY: with the cache on, a list page is assembled from cached bytes
+    instead of building + encoding a fresh dict per task.
+    """
+    if SERIALIZE_CACHE:
+        items = b",".join([TASK_JSON.get(t) for t in tasks])
+        body = b'{"items":[' + items + b"]," + jsonenc.dumps_bytes(meta)[1:]
+        response = app.response_class(body, mimetype="application/json")
+    else:
+        response = jsonify({"items": [serialize_task(t) for t in tasks], **meta})
+    response.set_etag(etag)
+    return response, 200
+
+def task_response(task: dict, status: int = 200):
+    if SERIALIZE_CACHE:
+        response = app.response_class(TASK_JSON.get(task), mimetype="application/json")
+    else:
+        response = jsonify(serialize_task(task))
+    response.set_etag(task_etag(task))
+    return response, status
+
+# -----------------------------
+# Conditional GET (ETag / If-None-Match)
+# -----------------------------
+# WHY: dashboards poll every few seconds and data rarely changes.
+# If the client's ETag still matches, answer 304 with no body and
+# skip serialization entirely.
+# - one task:  ETag follows the task's version
+# - list page: ETag follows the store-wide version (any write changes it)
+def not_modified(etag: str):
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
 def validate_task_create(data: dict | None):
     """
     WHEN: Always validate user input at the edge (API boundary).
@@ -92,61 +255,127 @@ def validate_task_patch(data: dict | None):
         return "Field 'status' must be one of: todo, doing, done"
     return None
 
+# -----------------------------
+# Write helpers (shared by single + batch routes)
+# -----------------------------
+def apply_create(data: dict) -> dict:
+    now = datetime.utcnow()
+    task = {
+        "id": str(uuid4()),
+        "title": data["title"].strip(),
+        "status": "todo",
+        "createdAt": now,
+        "updatedAt": now,
+    }
+    return TASKS.add(task)
+
+def apply_patch(task_id: str, data: dict) -> dict | None:
+    changes = {"updatedAt": datetime.utcnow()}
+    if "title" in data:
+        changes["title"] = data["title"].strip()
+    if "status" in data:
+        changes["status"] = data["status"]
+    # Go through the store so the status index follows the task
+    # (and the version bump invalidates the cached JSON fragment).
+    return TASKS.update(task_id, changes)
+
+def apply_delete(task_id: str) -> bool:
+    if TASKS.remove(task_id) is None:
+        return False
+    TASK_JSON.discard(task_id)
+    return True
+
 # -----------------------------
 # Routes
 # -----------------------------
+MAX_PAGE_LIMIT = 200
+
 @app.get("/api/v1/tasks")
 def list_tasks():
     """
     Supports:
     - filtering: ?status=done
     - pagination: ?limit=10&offset=0
+    - cursor pagination: ?cursor= (first page), then ?cursor=<next_cursor>
+    - sorting: ?sort=createdAt (default) | -createdAt | updatedAt | -updatedAt
+    - title search: ?q=pay invoice (every word must match, best match first)
     """
-    status = request.args.get("status")
-    limit = request.args.get("limit", type=int) or 50
-    offset = request.args.get("offset", type=int) or 0
+    # Read the store version BEFORE the data: the ETag may then be older
+    # than the page (harmless re-fetch), never newer (a wrong 304).
+    etag = list_etag(TASKS.version)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
 
-    tasks = list(TASKS.values())
-    if status:
-        tasks = [t for t in tasks if t["status"] == status]
+    status = request.args.get("status") or None
+    limit = request.args.get("limit", 50, type=int)
+    offset = request.args.get("offset", 0, type=int)
+    # Same bounds as the FastAPI version (Query(ge=1, le=200) / Query(ge=0)).
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        return error_response(400, "VALIDATION_ERROR", f"limit must be between 1 and {MAX_PAGE_LIMIT}")
+    if offset < 0:
+        return error_response(400, "VALIDATION_ERROR", "offset must be >= 0")
+    cursor = request.args.get("cursor")
+    q = request.args.get("q")
+    sort = request.args.get("sort") or "createdAt"
+    if sort not in SORT_OPTIONS:
+        return error_response(400, "VALIDATION_ERROR", f"sort must be one of: {', '.join(SORT_OPTIONS)}")
 
-    # Pagination (simple offset/limit)
-    paged = tasks[offset: offset + limit]
+    if q is not None:
+        # Inverted index over title words: cost follows the matches,
+        # not the number of tasks. Ranked results page with offset only.
+        if cursor is not None:
+            return error_response(400, "VALIDATION_ERROR", "q can't be combined with cursor; use offset")
+        paged, total = TASKS.search(q, status, offset, limit)
+        return list_response(paged, {"total": total, "limit": limit, "offset": offset}, etag)
 
-    return jsonify({
-        "items": [serialize_task(t) for t in paged],
-        "total": len(tasks),
+    if cursor is not None:
+        # Keyset pagination on (createdAt, id):
+        # - each page costs only its own size, however deep
+        # - new tasks sort last, so they never shift earlier pages
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return error_response(400, "INVALID_CURSOR", str(e))
+        paged, next_key = TASKS.page_after(status, after, limit, sort)
+        return list_response(paged, {
+            "total": TASKS.count(status),
+            "limit": limit,
+            "next_cursor": encode_cursor(next_key) if next_key else None,
+        }, etag)
+
+    # Pagination (simple offset/limit) straight from the index:
+    # O(log N + page) instead of copying + filtering (or sorting) every task.
+    paged, total = TASKS.page(status, offset, limit, sort)
+
+    return list_response(paged, {
+        "total": total,
         "limit": limit,
         "offset": offset
-    }), 200
+    }, etag)
 
 @app.get("/api/v1/tasks/<task_id>")
 def get_task(task_id: str):
     task = TASKS.get(task_id)
     if not task:
         return error_response(404, "TASK_NOT_FOUND", f"Task '{task_id}' not found")
-    return jsonify(serialize_task(task)), 200
+    cached = not_modified(task_etag(task))
+    if cached is not None:
+        return cached
+    return task_response(task)
 
 @app.post("/api/v1/tasks")
+@idempotent(IDEMPOTENCY, error_response)
 def create_task():
     data = request.get_json(silent=True)
     err = validate_task_create(data)
     if err:
         return error_response(400, "VALIDATION_ERROR", err)
 
-    now = datetime.utcnow()
-    task_id = str(uuid4())
-    task = {
-        "id": task_id,
-        "title": data["title"].strip(),
-        "status": "todo",
-        "createdAt": now,
-        "updatedAt": now,
-    }
-    TASKS[task_id] = task
+    task = apply_create(data)
 
     # 201 Created is the REST-friendly status for creation
-    return jsonify(serialize_task(task)), 201
+    return task_response(task, 201)
 
 @app.patch("/api/v1/tasks/<task_id>")
 def patch_task(task_id: str):
@@ -159,22 +388,108 @@ def patch_task(task_id: str):
     if err:
         return error_response(400, "VALIDATION_ERROR", err)
 
-    if "title" in data:
-        task["title"] = data["title"].strip()
-    if "status" in data:
-        task["status"] = data["status"]
-
-    task["updatedAt"] = datetime.utcnow()
-    return jsonify(serialize_task(task)), 200
+    task = apply_patch(task_id, data)
+    if task is None:  # deleted by another request since the lookup above
+        return error_response(404, "TASK_NOT_FOUND", f"Task '{task_id}' not found")
+    return task_response(task)
 
 @app.delete("/api/v1/tasks/<task_id>")
 def delete_task(task_id: str):
-    if task_id not in TASKS:
+    if not apply_delete(task_id):
         return error_response(404, "TASK_NOT_FOUND", f"Task '{task_id}' not found")
-    del TASKS[task_id]
     # 204: no body returned
     return "", 204
 
+# ============================================================
+# Metrics (Prometheus)
+# ============================================================
+@app.get("/metrics")
+def metrics():
+    """Prometheus text format; point a scrape job at this URL."""
+    if METRICS is None:
+        return error_response(404, "NOT_FOUND", "Metrics are turned off (TASK_METRICS=0)")
+    return Response(METRICS.render(), content_type=Metrics.CONTENT_TYPE)
+
+# ============================================================
+# Streaming export (NDJSON)
+# ============================================================
+# WHY: one giant jsonify() holds every task in memory at once.
+# A generator yields one JSON object per line, chunk by chunk, so memory
+# stays flat however many tasks there are. Clients read it line by line.
+@app.get("/api/v1/tasks:export")
+def export_tasks():
+    status = request.args.get("status") or None
+
+    def generate():
+        for task in scan_tasks(TASKS, status):
+            if SERIALIZE_CACHE:
+                yield TASK_JSON.get(task, keep=False) + b"\n"  # don't flush the cache
+            else:
+                yield jsonenc.dumps_bytes(serialize_task(task)) + b"\n"
+
+    return app.response_class(generate(), mimetype="application/x-ndjson")
+
+# ============================================================
+# Batch mutations
+# ============================================================
+# WHY: clients that create/update thousands of tasks paid one HTTP round
+# trip per task. One batch request amortizes parsing, routing and network
+# overhead across the whole burst.
+#
+# Body: JSON array of operations
+#   {"op": "create", "data": {"title": "..."}}
+#   {"op": "patch",  "id": "<task id>", "data": {"status": "done"}}
+#   {"op": "delete", "id": "<task id>"}
+#
+# Rules:
+# - Validate everything first (one pass). Any invalid op -> 400, nothing applied.
+# - Then apply in order; each op gets its own result (201/200/204/404).
+MAX_BATCH_OPS = 5000
+
+def validate_batch_op(op) -> str | None:
+    if not isinstance(op, dict):
+        return "Operation must be a JSON object"
+    kind = op.get("op")
+    if kind == "create":
+        return validate_task_create(op.get("data"))
+    if kind not in {"patch", "delete"}:
+        return "Field 'op' must be one of: create, patch, delete"
+    if not isinstance(op.get("id"), str):
+        return "Field 'id' is required and must be a string"
+    if kind == "patch":
+        return validate_task_patch(op.get("data"))
+    return None
+
+@app.post("/api/v1/tasks:batch")
+@idempotent(IDEMPOTENCY, error_response)
+def batch_tasks():
+    ops = request.get_json(silent=True)
+    if not isinstance(ops, list) or not ops:
+        return error_response(400, "VALIDATION_ERROR", "Body must be a non-empty JSON array of operations")
+    if len(ops) > MAX_BATCH_OPS:
+        return error_response(413, "BATCH_TOO_LARGE", f"At most {MAX_BATCH_OPS} operations per batch")
+
+    errors = [{"index": i, "message": err} for i, op in enumerate(ops) if (err := validate_batch_op(op))]
+    if errors:
+        return error_response(400, "VALIDATION_ERROR", "Invalid operations in batch", {"errors": errors})
+
+    results = []
+    for op in ops:
+        kind = op["op"]
+        if kind == "create":
+            results.append({"status": 201, "data": serialize_task(apply_create(op["data"]))})
+        elif kind == "patch":
+            task = apply_patch(op["id"], op["data"]) if op["id"] in TASKS else None
+            if task is None:
+                results.append({"status": 404, "error": {"code": "TASK_NOT_FOUND", "message": f"Task '{op['id']}' not found"}})
+            else:
+                results.append({"status": 200, "data": serialize_task(task)})
+        elif apply_delete(op["id"]):
+            results.append({"status": 204})
+        else:
+            results.append({"status": 404, "error": {"code": "TASK_NOT_FOUND", "message": f"Task '{op['id']}' not found"}})
+
+    return jsonify({"results": results}), 200
 
 if __name__ == "__main__":
     # Debug only. Production uses a WSGI server like gunicorn/uwsgi.
@@ -1,15 +1,29 @@
+import os
+
 from fastapi import FastAPI, Depends, HTTPException
 from sqlalchemy import create_engine, Column, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from pydantic import BaseModel
 
+# Shared Day 8 helpers live one folder up (Day8/Python/api_utils): put that
+# folder on the import path when running (test.db stays next to this file):
+#   cd Day8/Python/FastAPIDemo && PYTHONPATH=.. python Sqlite.py
+from api_utils.sqlite_profile import apply_sqlite_profile
+
 # FastAPI app instance
 app = FastAPI()
 
 # Database setup
 DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(DATABASE_URL)
+
+# SQLite performance profile, applied to EVERY new connection (PRAGMAs are
+# per connection): SQLITE_PROFILE=balanced (default: WAL, synchronous=NORMAL,
+# mmap/cache, busy_timeout) | durable | off. See api_utils/sqlite_profile.py;
+# an unknown name fails at startup with ValueError.
+apply_sqlite_profile(engine, os.getenv("SQLITE_PROFILE", "balanced"))
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -11,9 +11,10 @@ This file demonstrates:
 
 Install:
   python -m pip install Flask marshmallow
+  python -m pip install orjson   # optional: faster JSON encoding
 
-Run:
-  python app.py
+Run (from this folder; api_utils lives one folder up, in Day8/Python):
+  PYTHONPATH=.. python app.py
 
 Try:
   # 1) Serialization with jsonify
@@ -46,8 +47,12 @@ from typing import List
 from flask import Flask, jsonify, request
 from marshmallow import Schema, ValidationError, fields, post_load
 
+from api_utils.flask_json import FastJSONProvider  # Day8/Python: see "Run" above
+
 
 app = Flask(__name__)
+# jsonify() via api_utils.jsonenc: orjson when installed, stdlib otherwise.
+app.json = FastJSONProvider(app)
 
 
 # ---------------------------
@@ -0,0 +1,56 @@
+"""
+api_utils package
+-----------------
+Shared building blocks for the Day 8 task APIs (Flask + FastAPI labs).
+
+Flask-only helpers (flask_json.FastJSONProvider, flask_idempotency.idempotent)
+are imported from their module directly, so FastAPI-only installs don't need Flask.
+Same for sqlite_profile.apply_sqlite_profile, which needs SQLAlchemy.
+"""
+
+from . import jsonenc
+from .compression import ASGICompressionMiddleware, CompressedCache, Compressor, WSGICompressionMiddleware
+from .cursor import decode_cursor, encode_cursor
+from .etags import if_none_match, list_etag, task_etag
+from .idempotency import IdempotencyCache, StoredResponse
+from .metrics import ROUTE_KEY, ASGIMetricsMiddleware, Metrics, WSGIMetricsMiddleware
+from .overload import ASGIOverloadMiddleware, ConcurrencyLimiter, RateLimiter, WSGIOverloadMiddleware
+from .records import TaskRecord
+from .serialization import FragmentCache
+from .shared_store import SqliteTaskStore
+from .snapshot import SnapshotTaskStore, write_snapshot
+from .store import SORT_OPTIONS, TaskStore, scan_tasks
+from .wal import WriteAheadLog, open_logged_store
+
+__all__ = [
+    "ASGICompressionMiddleware",
+    "ASGIMetricsMiddleware",
+    "ASGIOverloadMiddleware",
+    "CompressedCache",
+    "Compressor",
+    "ConcurrencyLimiter",
+    "FragmentCache",
+    "IdempotencyCache",
+    "Metrics",
+    "ROUTE_KEY",
+    "RateLimiter",
+    "SORT_OPTIONS",
+    "SnapshotTaskStore",
+    "SqliteTaskStore",
+    "StoredResponse",
+    "TaskRecord",
+    "TaskStore",
+    "WSGICompressionMiddleware",
+    "WSGIMetricsMiddleware",
+    "WSGIOverloadMiddleware",
+    "WriteAheadLog",
+    "decode_cursor",
+    "encode_cursor",
+    "if_none_match",
+    "jsonenc",
+    "list_etag",
+    "open_logged_store",
+    "scan_tasks",
+    "task_etag",
+    "write_snapshot",
+]
@@ -0,0 +1,295 @@
+"""
+compression.py
+--------------
+Response compression (gzip, + brotli / zstd when installed) negotiated via
+Accept-Encoding, as WSGI (Flask) and ASGI (FastAPI) middleware, with a
+cache of compressed bytes for responses that carry an ETag.
+"""
+
+from __future__ import annotations
+
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+try:  # Optional (pip install brotli)
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+try:  # Optional (pip install zstandard)
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+# Levels tuned for responses built per request: most of the size win for a
+# fraction of the CPU of the max levels (gzip 9 / brotli 11 are for static files).
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+COMPRESSORS: dict[str, Callable[[bytes], bytes]] = {}
+if brotli is not None:
+    COMPRESSORS["br"] = lambda data: brotli.compress(data, quality=BROTLI_QUALITY)
+if zstandard is not None:
+    _zstd = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    COMPRESSORS["zstd"] = lambda data: _zstd.compress(data)
+COMPRESSORS["gzip"] = lambda data: gzip.compress(data, GZIP_LEVEL, mtime=0)
+
+# Server preference when the client accepts several with the same q-value.
+ENCODINGS = tuple(COMPRESSORS)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def negotiate(accept_encoding: str | None, encodings: tuple[str, ...] = ENCODINGS) -> str | None:
+    """
+    Pick a coding from Accept-Encoding ("gzip, br;q=0.8, *;q=0.1"), or
+    None = send it uncompressed. Highest q wins; ties go to `encodings` order.
+    """
+    if not accept_encoding:
+        return None
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+    star = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in encodings:
+        q = weights.get(coding, star)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressedCache:
+    """
+    WHAT: (route + query, ETag, coding) -> compressed bytes, LRU-bounded.
+    WHY: a list page compresses 5-10x, but compressing 50-100 KB costs about
+    as much as building it. Pages polled by many clients keep the same ETag
+    until the data changes, so each (page, version, coding) is compressed once.
+
+    The ETag must identify the bytes for that URL (true for the task APIs:
+    task version / store version). Responses without one are not cached.
+    """
+
+    def __init__(self, max_entries: int = 1_024, max_bytes: int = 32 * 1024 * 1024) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> bytes | None:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: Hashable, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+class Compressor:
+    """
+    Shared by both middlewares: decides whether a response gets compressed
+    and produces the bytes (from the cache when possible).
+    - only bodies of at least `min_size` bytes (small JSON gains nothing)
+    - only compressible content types, never an already-encoded body
+    """
+
+    def __init__(
+        self,
+        min_size: int = 1_024,
+        cache: CompressedCache | None = None,
+        encodings: tuple[str, ...] = ENCODINGS,
+    ) -> None:
+        self.min_size = min_size
+        self.cache = cache
+        self.encodings = encodings
+
+    def wants(self, content_type: str | None, content_encoding: str | None, length: int) -> bool:
+        return (
+            length >= self.min_size
+            and content_encoding is None
+            and content_type is not None
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+        )
+
+    def compress(self, body: bytes, coding: str, cache_key: Hashable | None = None) -> bytes:
+        if self.cache is None or cache_key is None:
+            return COMPRESSORS[coding](body)
+        key = (cache_key, coding)
+        data = self.cache.get(key)
+        if data is None:
+            data = COMPRESSORS[coding](body)
+            self.cache.put(key, data)
+        return data
+
+
+def weak_etag(etag: str) -> str:
+    """
+    A compressed body is a different representation, so its ETag can't stay
+    strong. Weak keeps If-None-Match working (it uses weak comparison).
+    """
+    return etag if etag.startswith("W/") else "W/" + etag
+
+
+class WSGICompressionMiddleware:
+    """
+    Usage (Flask): app.wsgi_app = WSGICompressionMiddleware(app.wsgi_app, Compressor(...))
+    Install it INSIDE the metrics middleware, so metrics see wire sizes.
+    Only 200 responses with a Content-Length are compressed; streamed ones
+    (NDJSON export) pass through unchanged.
+    """
+
+    def __init__(self, app: Callable, compressor: Compressor) -> None:
+        self.app = app
+        self.compressor = compressor
+
+    def __call__(self, environ: dict, start_response: Callable):
+        coding = negotiate(environ.get("HTTP_ACCEPT_ENCODING"), self.compressor.encodings)
+        if coding is None or environ.get("REQUEST_METHOD") == "HEAD":
+            return self.app(environ, start_response)
+
+        held: list = []  # [status, headers, exc_info] until the body size is known
+        written: list[bytes] = []  # legacy write() calls
+
+        def holding_start_response(status, headers, exc_info=None):
+            held[:] = (status, headers, exc_info)
+            return written.append
+
+        body = self.app(environ, holding_start_response)
+        if not held:
+            # start_response deferred to the first chunk: not ours to buffer.
+            return _DeferredStart(body, held, start_response)
+
+        status, headers, exc_info = held
+        fields = {name.lower(): value for name, value in headers}
+        length = fields.get("content-length")
+        if (not status.startswith("200") or length is None
+                or not self.compressor.wants(fields.get("content-type"), fields.get("content-encoding"), int(length))):
+            start_response(status, headers, exc_info)
+            return [*written, *body] if written else body
+
+        try:
+            data = b"".join([*written, *body])
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+        etag = fields.get("etag")
+        cache_key = None
+        if etag is not None and not etag.startswith("W/"):
+            cache_key = (environ.get("PATH_INFO", ""), environ.get("QUERY_STRING", ""), etag)
+        data = self.compressor.compress(data, coding, cache_key)
+        headers = [(name, value) for name, value in headers if name.lower() not in ("content-length", "etag")]
+        headers += [("Content-Encoding", coding), ("Content-Length", str(len(data))), ("Vary", "Accept-Encoding")]
+        if etag is not None:
+            headers.append(("ETag", weak_etag(etag)))
+        start_response(status, headers, exc_info)
+        return [data]
+
+
+class _DeferredStart:
+    """WSGI body whose app calls start_response lazily: forward it untouched."""
+
+    def __init__(self, body, held: list, start_response: Callable) -> None:
+        self._body = body
+        self._held = held
+        self._start_response = start_response
+
+    def __iter__(self):
+        for chunk in self._body:
+            if self._held:
+                self._start_response(*self._held)
+                self._held = None
+            yield chunk
+        if self._held:  # empty body
+            self._start_response(*self._held)
+            self._held = None
+
+    def close(self) -> None:
+        if hasattr(self._body, "close"):
+            self._body.close()
+
+
+class ASGICompressionMiddleware:
+    """
+    Usage (FastAPI): app.add_middleware(ASGICompressionMiddleware, compressor=Compressor(...))
+    Add it BEFORE the metrics middleware (i.e. inside it). Like the WSGI
+    version, only 200 responses that declare a content-length are compressed.
+    """
+
+    def __init__(self, app: Callable, compressor: Compressor) -> None:
+        self.app = app
+        self.compressor = compressor
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"accept-encoding"), None)
+        coding = negotiate(accept, self.compressor.encodings)
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        held: dict = {}  # the http.response.start message, while buffering
+        chunks: list[bytes] = []
+
+        async def compressing_send(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                fields = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in message.get("headers", [])}
+                length = fields.get("content-length")
+                if (message["status"] == 200 and length is not None and self.compressor.wants(
+                        fields.get("content-type"), fields.get("content-encoding"), int(length))):
+                    held.update(message, etag=fields.get("etag"))
+                    return
+            elif message["type"] == "http.response.body" and held:
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    await send_compressed(b"".join(chunks))
+                return
+            await send(message)
+
+        async def send_compressed(data: bytes) -> None:
+            etag = held.pop("etag")
+            cache_key = None
+            if etag is not None and not etag.startswith("W/"):
+                cache_key = (scope["path"], scope.get("query_string", b""), etag)
+            data = self.compressor.compress(data, coding, cache_key)
+            headers = [(k, v) for k, v in held.get("headers", []) if k.lower() not in (b"content-length", b"etag")]
+            headers += [
+                (b"content-encoding", coding.encode()),
+                (b"content-length", str(len(data)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            if etag is not None:
+                headers.append((b"etag", weak_etag(etag).encode("latin-1")))
+            await send({**held, "headers": headers})
+            await send({"type": "http.response.body", "body": data})
+
+        await self.app(scope, receive, compressing_send)
@@ -0,0 +1,35 @@
+"""
+cursor.py
+---------
+Opaque pagination cursors for keyset (cursor) pagination.
+"""
+
+from __future__ import annotations
+
+import base64
+from typing import Any, Callable, Hashable
+
+
+def encode_cursor(key: tuple[int, Hashable]) -> str:
+    """
+    (createdAt in epoch microseconds, id) -> url-safe token.
+    WHY opaque: clients must not build cursors by hand, so we can change
+    the key later without breaking them.
+    """
+    created_us, task_id = key
+    raw = f"{created_us}|{task_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, id_type: Callable[[str], Any] = str) -> tuple[int, Any]:
+    """
+    Token -> (createdAt in epoch microseconds, id). Raises ValueError on
+    anything malformed. `id_type` converts the id back (e.g. UUID for FastAPI).
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        created_us, task_id = raw.split("|", 1)
+        return int(created_us), id_type(task_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
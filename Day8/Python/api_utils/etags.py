@@ -0,0 +1,38 @@
+"""
+etags.py
+--------
+Strong ETags for task reads + If-None-Match matching (conditional GET).
+"""
+
+from __future__ import annotations
+
+
+def task_etag(task: dict) -> str:
+    """Unquoted ETag for one task: changes whenever the task's version does."""
+    return f"t{task['version']}"
+
+
+def list_etag(store_version: int) -> str:
+    """
+    Unquoted ETag for a list page: changes whenever anything in the store does.
+    The URL (filters/page) is already part of the cache key on the client side.
+    """
+    return f"s{store_version}"
+
+
+def if_none_match(header: str | None, etag: str) -> bool:
+    """
+    True if the If-None-Match header matches `etag` (so answer 304).
+    RFC 9110: If-None-Match uses weak comparison, so W/"x" matches "x".
+    """
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
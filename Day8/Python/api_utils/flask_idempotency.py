@@ -0,0 +1,57 @@
+"""
+flask_idempotency.py
+--------------------
+Flask view decorator for the Idempotency-Key header (see idempotency.py).
+
+Usage:
+    @app.post("/api/v1/tasks")
+    @idempotent(IDEMPOTENCY, error_response)
+    def create_task(): ...
+"""
+
+from __future__ import annotations
+
+import hashlib
+from functools import wraps
+from typing import Callable
+
+from flask import current_app, request
+
+from .idempotency import HEADER, REPLAYED_HEADER, IdempotencyCache, StoredResponse, check_key
+
+
+def idempotent(cache: IdempotencyCache, error_response: Callable) -> Callable:
+    """
+    Requests without the header run as before. With it, the first request
+    runs the view and its response is stored; retries (and duplicates that
+    arrive while it runs) get that response back, marked Idempotent-Replayed.
+    - invalid key -> 400, key reused with another body -> 422
+    """
+
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if key is None:
+                return view(*args, **kwargs)
+            err = check_key(key)
+            if err:
+                return error_response(400, "VALIDATION_ERROR", err)
+
+            def run() -> StoredResponse:
+                response = current_app.make_response(view(*args, **kwargs))
+                return StoredResponse(response.status_code, response.get_data(), tuple(response.headers.items()))
+
+            fingerprint = hashlib.sha256(request.get_data()).digest()
+            try:
+                stored, replayed = cache.execute((request.path, key), fingerprint, run)
+            except ValueError as e:
+                return error_response(422, "IDEMPOTENCY_KEY_REUSED", str(e))
+            response = current_app.response_class(stored.body, status=stored.status, headers=list(stored.headers))
+            if replayed:
+                response.headers[REPLAYED_HEADER] = "true"
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,41 @@
+"""
+flask_json.py
+-------------
+Flask JSON provider that routes jsonify() through api_utils.jsonenc.
+
+Usage:
+    app.json = FastJSONProvider(app)
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+from . import jsonenc
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    WHY: jsonify() uses the stdlib encoder. Swapping the provider changes
+    every jsonify() call in the app at once, without touching the routes.
+    Debug mode (pretty output) and custom dump kwargs keep the stdlib path.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            kwargs.setdefault("default", jsonenc.default)
+            return super().dumps(obj, **kwargs)
+        return jsonenc.dumps(obj)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return jsonenc.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(jsonenc.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,135 @@
+"""
+idempotency.py
+--------------
+Idempotency-Key support for create endpoints: a bounded TTL cache of the
+original responses, with concurrent duplicates coalesced onto one execution.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Callable, Hashable, NamedTuple
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+class StoredResponse(NamedTuple):
+    """Framework-neutral copy of a response: enough to send it again byte for byte."""
+
+    status: int
+    body: bytes
+    headers: tuple[tuple[str, str], ...]
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "done", "response", "expires")
+
+    def __init__(self, fingerprint: Hashable) -> None:
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response: StoredResponse | None = None  # None after done = failed, retry
+        self.expires = float("inf")  # in flight: never expires
+
+
+def check_key(key: str) -> str | None:
+    """Error message for an unusable key, None if it's fine."""
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return f"{HEADER} must be 1-{MAX_KEY_LENGTH} characters"
+    return None
+
+
+class IdempotencyCache:
+    """
+    WHAT: key -> the response the first request with that key got, kept
+    for `ttl` seconds (at most `max_entries`: oldest finished one evicted first).
+    WHY: mobile clients retry POST on timeouts. Without a key every retry
+    creates another task; with one, a retry gets the original 201 back.
+
+    COALESCING: a duplicate that arrives while the first request is still
+    running waits for it and gets the same response (no second execution,
+    no 409 for the client to handle).
+
+    RULES (same as the IETF Idempotency-Key draft / Stripe):
+    - same key + different body -> ValueError (the key was reused by mistake)
+    - 5xx responses and exceptions are not stored: the retry runs again
+    - keys are scoped by the caller (e.g. (path, key)); the cache is per
+      process, so with several workers each one dedupes its own traffic
+    """
+
+    def __init__(self, ttl: float = 24 * 3600, max_entries: int = 100_000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def execute(
+        self,
+        key: Hashable,
+        fingerprint: Hashable,
+        handler: Callable[[], StoredResponse],
+    ) -> tuple[StoredResponse, bool]:
+        """Run `handler` once per key; returns (response, replayed)."""
+        while True:
+            now = monotonic()
+            with self._lock:
+                self._expire(now)
+                entry = self._entries.get(key)
+                leader = entry is None
+                if leader:
+                    entry = self._entries[key] = _Entry(fingerprint)
+                    if len(self._entries) > self.max_entries:
+                        self._evict_one()
+            if entry.fingerprint != fingerprint:
+                raise ValueError(f"{HEADER} was already used with a different request body")
+            if leader:
+                return self._run(key, entry, handler), False
+            entry.done.wait()
+            if entry.response is not None:
+                return entry.response, True
+            # The first attempt failed and was forgotten: try again (maybe as the leader).
+
+    def _run(self, key: Hashable, entry: _Entry, handler: Callable[[], StoredResponse]) -> StoredResponse:
+        response = None
+        try:
+            response = handler()
+            return response
+        finally:
+            try:
+                with self._lock:
+                    current = self._entries.get(key) is entry
+                    if response is not None and response.status < 500:
+                        entry.response = response
+                        entry.expires = monotonic() + self.ttl
+                        if current:
+                            self._entries.move_to_end(key)  # keeps the dict in expiry order
+                    elif current:
+                        del self._entries[key]
+            finally:
+                entry.done.set()  # waiters must wake up whatever happened above
+
+    def _evict_one(self) -> None:
+        """
+        Drop the oldest FINISHED entry. In-flight ones are never evicted:
+        their request already runs, and a retry arriving now must wait for
+        it, not execute a second time. If every entry is in flight, the
+        cache goes over max_entries until one finishes.
+        """
+        for key, entry in self._entries.items():
+            if entry.done.is_set():
+                del self._entries[key]
+                return
+
+    def _expire(self, now: float) -> None:
+        entries = self._entries
+        while entries:
+            entry = next(iter(entries.values()))
+            if entry.expires > now:
+                break
+            entries.popitem(last=False)
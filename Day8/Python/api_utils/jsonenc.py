@@ -0,0 +1,58 @@
+"""
+jsonenc.py
+----------
+Pluggable JSON encoding: orjson when installed, stdlib json otherwise.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+try:  # Optional fast backend (pip install orjson)
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# API_JSON_BACKEND=json forces the stdlib backend (e.g. to compare speed).
+BACKEND = "orjson" if orjson is not None and os.getenv("API_JSON_BACKEND", "auto") != "json" else "json"
+
+
+def default(o: Any) -> Any:
+    """
+    Same rules as SafeJSONEncoder in Day8_json_serialization.py:
+    datetime -> ISO string, UUID -> str, Decimal -> str (no float rounding).
+    """
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, UUID):
+        return str(o)
+    if isinstance(o, Decimal):
+        return str(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+if BACKEND == "orjson":
+    # orjson writes datetime/UUID natively (same text as isoformat()/str());
+    # `default` only sees the rest (Decimal, ...).
+    _ORJSON_OPTS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTS)
+
+    loads = orjson.loads
+else:
+    _encoder = json.JSONEncoder(default=default, separators=(",", ":"), ensure_ascii=False)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return _encoder.encode(obj).encode("utf-8")
+
+    loads = json.loads
+
+
+def dumps(obj: Any) -> str:
+    return dumps_bytes(obj).decode("utf-8")
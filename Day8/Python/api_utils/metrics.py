@@ -0,0 +1,235 @@
+"""
+metrics.py
+----------
+Request metrics (latency / size histograms, in-flight gauge) in Prometheus
+text format, recorded by WSGI (Flask) or ASGI (FastAPI) middleware.
+"""
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from functools import partial
+from time import perf_counter
+from typing import Callable, Iterable
+
+# Fixed buckets (upper bounds). Fixed = recording is one bisect + one increment.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+UNMATCHED = "<unmatched>"  # 404s and requests refused before routing
+ROUTE_KEY = "api_utils.route"  # WSGI environ key the app sets to the matched route template
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, buckets: tuple) -> None:
+        self.counts = [0] * (len(buckets) + 1)  # last slot = +Inf
+        self.sum = 0.0
+
+
+class Metrics:
+    """
+    WHAT: per (method, route, status) histograms of latency, request size
+    and response size, plus a gauge of requests in flight.
+    WHY fixed buckets: percentiles can be computed later by Prometheus
+    (histogram_quantile), while recording stays O(1) per request.
+
+    LABELS: route is the TEMPLATE ("/api/v1/tasks/<task_id>"), never the raw
+    path, otherwise every task id would create a new time series.
+
+    COST: one lock + a few list increments per request: ~2 us around a
+    do-nothing app, ~6 us end to end on a Flask GET of ~60 us (route label
+    included; each Python call costs more once Flask's own work has pushed
+    this code out of the CPU caches). See `Day8_benchmarks.py metrics`.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, str, int], tuple[_Histogram, _Histogram, _Histogram]] = {}
+        self.in_flight = 0
+
+    def started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def observe(self, method: str, route: str, status: int, seconds: float,
+                request_bytes: int, response_bytes: int) -> None:
+        # Bucket positions and the series are found before taking the lock
+        # (hot path, unrolled). Series are created once per label tuple and
+        # never removed, so the lock-free dict read is safe.
+        i = bisect_left(LATENCY_BUCKETS, seconds)
+        j = bisect_left(SIZE_BUCKETS, request_bytes)
+        k = bisect_left(SIZE_BUCKETS, response_bytes)
+        series = self._series.get((method, route, status))
+        if series is None:
+            series = self._new_series((method, route, status))
+        latency, request_size, response_size = series
+        with self._lock:
+            self.in_flight -= 1
+            latency.counts[i] += 1
+            latency.sum += seconds
+            request_size.counts[j] += 1
+            request_size.sum += request_bytes
+            response_size.counts[k] += 1
+            response_size.sum += response_bytes
+
+    def _new_series(self, key: tuple[str, str, int]) -> tuple[_Histogram, _Histogram, _Histogram]:
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = (
+                    _Histogram(LATENCY_BUCKETS), _Histogram(SIZE_BUCKETS), _Histogram(SIZE_BUCKETS),
+                )
+            return series
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            series = {key: tuple((list(h.counts), h.sum) for h in hists) for key, hists in self._series.items()}
+            in_flight = self.in_flight
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {in_flight}",
+        ]
+        for i, (name, help_text, buckets) in enumerate((
+            ("http_request_duration_seconds", "Time to the response headers.", LATENCY_BUCKETS),
+            ("http_request_size_bytes", "Request body size (Content-Length).", SIZE_BUCKETS),
+            ("http_response_size_bytes", "Response body size.", SIZE_BUCKETS),
+        )):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (method, route, status), hists in sorted(series.items()):
+                counts, total = hists[i]
+                labels = f'method="{method}",route="{_escape(route)}",status="{status}"'
+                cumulative = 0
+                for bound, count in zip((*buckets, "+Inf"), counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {total}")
+                lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _content_length(headers: list[tuple[str, str]]) -> int | None:
+    for name, value in headers:
+        if name == "Content-Length":  # what Flask/Werkzeug send: no lower() per header
+            return int(value)
+    for name, value in headers:
+        if name.lower() == "content-length":
+            return int(value)
+    return None
+
+
+class _CountingBody:
+    """WSGI body wrapper for responses without Content-Length (e.g. NDJSON export)."""
+
+    def __init__(self, body: Iterable[bytes], done: Callable[[int], None]) -> None:
+        self._body = body
+        self._done = done
+        self._sent = 0
+
+    def __iter__(self):
+        for chunk in self._body:
+            self._sent += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            if hasattr(self._body, "close"):
+                self._body.close()
+        finally:
+            self._done(self._sent)
+
+
+class WSGIMetricsMiddleware:
+    """
+    Usage (Flask): app.wsgi_app = WSGIMetricsMiddleware(app.wsgi_app, metrics)
+    Install it OUTERMOST, so refused (429/503) requests are counted too.
+    WSGI has no notion of routes: the app stores the matched template in
+    environ[ROUTE_KEY] (Flask: see RouteLabelRequest in the app), else UNMATCHED.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        metrics: Metrics,
+        exempt_paths: tuple[str, ...] = ("/metrics",),
+    ) -> None:
+        self.app = app
+        self.metrics = metrics
+        self.exempt_paths = exempt_paths
+
+    def __call__(self, environ: dict, start_response: Callable):
+        if environ.get("PATH_INFO", "").startswith(self.exempt_paths):
+            return self.app(environ, start_response)
+        self.metrics.started()
+        start = perf_counter()
+        seen: list = []  # [latency, status line, headers]
+        # Only the capture happens inside start_response; parsing waits until
+        # the app returns.
+
+        def timed_start_response(status, headers, *args):
+            seen[:] = (perf_counter() - start, status, headers)
+            return start_response(status, headers, *args)
+
+        try:
+            body = self.app(environ, timed_start_response)
+        except BaseException:
+            self._record(environ, start, seen, 0)
+            raise
+        length = _content_length(seen[2]) if seen else None
+        if length is not None:  # the usual case, recorded inline (no _record frame)
+            self.metrics.observe(environ.get("REQUEST_METHOD", "GET"), environ.get(ROUTE_KEY, UNMATCHED),
+                                 int(seen[1][:3]), seen[0], int(environ.get("CONTENT_LENGTH") or 0), length)
+            return body
+        return _CountingBody(body, partial(self._record, environ, start, seen))
+
+    def _record(self, environ: dict, start: float, seen: list, response_bytes: int) -> None:
+        latency, status = (seen[0], int(seen[1][:3])) if seen else (perf_counter() - start, 500)
+        self.metrics.observe(environ.get("REQUEST_METHOD", "GET"), environ.get(ROUTE_KEY, UNMATCHED), status, latency,
+                             int(environ.get("CONTENT_LENGTH") or 0), response_bytes)
+
+
+class ASGIMetricsMiddleware:
+    """
+    Usage (FastAPI): app.add_middleware(ASGIMetricsMiddleware, metrics=metrics)
+    Added LAST, so it runs first (outermost). The route template comes from
+    scope["route"], which Starlette's router fills in while routing.
+    """
+
+    def __init__(self, app: Callable, metrics: Metrics, exempt_paths: tuple[str, ...] = ("/metrics",)) -> None:
+        self.app = app
+        self.metrics = metrics
+        self.exempt_paths = exempt_paths
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+        metrics = self.metrics
+        metrics.started()
+        start = perf_counter()
+        state: list = [None, 500, 0]  # latency, status, response bytes
+
+        async def timed_send(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                state[0], state[1] = perf_counter() - start, message["status"]
+            elif message["type"] == "http.response.body":
+                state[2] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            route = scope.get("route")
+            request_bytes = next((int(v) for k, v in scope["headers"] if k == b"content-length"), 0)
+            latency = state[0] if state[0] is not None else perf_counter() - start
+            metrics.observe(scope["method"], getattr(route, "path", UNMATCHED), state[1], latency,
+                            request_bytes, state[2])
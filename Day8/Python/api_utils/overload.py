@@ -0,0 +1,306 @@
+"""
+overload.py
+-----------
+Overload protection: per-client token buckets (429) + adaptive concurrency
+limit (503), as WSGI (Flask) and ASGI (FastAPI) middleware.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+from time import monotonic, perf_counter, time
+from typing import Any, Callable, Hashable, Iterable
+
+from . import jsonenc
+
+
+class RateLimiter:
+    """
+    WHAT: one token bucket per client. A bucket holds up to `burst` tokens
+    and refills at `rate` tokens/s; every request takes one token.
+    WHY: one noisy client can't eat the capacity everybody shares, while
+    short bursts (page load = several calls) still go through.
+
+    MEMORY: buckets live in an LRU dict capped at `max_clients`; a client
+    that gets evicted simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None, max_clients: int = 100_000) -> None:
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, client: Hashable) -> float:
+        """Take a token: 0.0 if allowed, else seconds until one is available."""
+        now = monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)  # re-insert = most recently seen
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class ConcurrencyLimiter:
+    """
+    WHAT: caps requests in flight at `limit` and adapts the limit (AIMD,
+    the TCP congestion-control idea):
+    - a request slower than `target_latency` -> limit * 0.9
+      (at most once per target_latency, so one slow burst isn't punished N times)
+    - otherwise -> limit + 1/limit (about +1 per `limit` fast requests),
+      but only while the limit is actually in use (no growth while idle)
+
+    WHY: past capacity, a server that accepts everything just builds a
+    queue: every new request waits behind all the others and latency grows
+    without bound. Refusing the excess right away (503 + Retry-After) keeps
+    admitted requests near the target and tells clients to back off.
+
+    Latency is measured from admission to the response headers, so it
+    includes any queueing inside the app (thread pool, GIL, DB locks).
+
+    QUEUEING BEFORE THE APP: a request can also wait in the socket backlog
+    or for a worker thread before any Python code sees it; in-flight counts
+    can't show that. When the proxy stamps X-Request-Start, the middleware
+    passes the wait to try_acquire(): past `max_queue_delay` the request is
+    refused (its answer would be late anyway) and the limit backs off.
+    """
+
+    def __init__(
+        self,
+        initial: int = 32,
+        min_limit: int = 2,
+        max_limit: int = 1_000,
+        target_latency: float = 0.05,
+        max_queue_delay: float | None = None,
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.max_queue_delay = max_queue_delay if max_queue_delay is not None else target_latency
+        self._limit = float(initial)
+        self._inflight = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def try_acquire(self, queue_delay: float = 0.0) -> bool:
+        """Take a slot; False if at the limit or the request already queued too long."""
+        with self._lock:
+            if queue_delay > self.max_queue_delay:
+                self._decrease(monotonic())
+                return False
+            if self._inflight >= int(self._limit):
+                return False
+            self._inflight += 1
+            return True
+
+    def release(self, latency: float) -> None:
+        now = monotonic()
+        with self._lock:
+            busy = self._inflight >= self._limit / 2
+            self._inflight -= 1
+            if latency > self.target_latency:
+                self._decrease(now)
+            elif busy:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+    def _decrease(self, now: float) -> None:
+        if now - self._last_decrease >= self.target_latency:
+            self._limit = max(self.min_limit, self._limit * 0.9)
+            self._last_decrease = now
+
+
+def queue_delay(request_start: str | None, now: float | None = None) -> float:
+    """
+    Seconds between X-Request-Start (set by the proxy / load balancer when the
+    request arrived) and now. Accepts "t=<s|ms|us since epoch>" or a bare
+    number; 0.0 when the header is missing or unreadable.
+    """
+    if not request_start:
+        return 0.0
+    try:
+        stamp = float(request_start.strip().removeprefix("t="))
+    except ValueError:
+        return 0.0
+    if stamp > 1e14:
+        stamp /= 1e6  # microseconds
+    elif stamp > 1e11:
+        stamp /= 1e3  # milliseconds
+    return max(0.0, (time() if now is None else now) - stamp)
+
+
+def default_error_body(code: str, message: str) -> dict:
+    """Same shape as the Flask app's error_response()."""
+    return {"error": {"code": code, "message": message, "details": {}}}
+
+
+def check_overload(
+    rate_limiter: RateLimiter | None,
+    concurrency: ConcurrencyLimiter | None,
+    client: Hashable,
+    request_start: str | None = None,
+) -> tuple[int, str, str, int] | None:
+    """
+    Admission check shared by both middlewares. None = admitted (and, with
+    a ConcurrencyLimiter, holding a slot the caller must release), else
+    (status, code, message, retry_after_seconds).
+    """
+    if rate_limiter is not None:
+        wait = rate_limiter.acquire(client)
+        if wait:
+            return 429, "RATE_LIMITED", "Too many requests, slow down", max(1, math.ceil(wait))
+    if concurrency is not None and not concurrency.try_acquire(queue_delay(request_start)):
+        return 503, "OVERLOADED", "Server is busy, retry shortly", 1
+    return None
+
+
+class _ReleaseOnClose:
+    """WSGI body wrapper: the concurrency slot is held until the body has been sent."""
+
+    def __init__(self, body: Iterable[bytes], release: Callable[[], None]) -> None:
+        self._body = body
+        self._release = release
+
+    def __iter__(self):
+        yield from self._body
+        self._done()  # body fully sent: free the slot without waiting for close()
+
+    def close(self) -> None:
+        try:
+            if hasattr(self._body, "close"):
+                self._body.close()
+        finally:
+            self._done()
+
+    def _done(self) -> None:
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+
+class WSGIOverloadMiddleware:
+    """
+    Usage (Flask): app.wsgi_app = WSGIOverloadMiddleware(app.wsgi_app, rate_limiter=..., concurrency=...)
+    Runs before Flask routing, so a rejected request costs microseconds.
+    Clients are keyed by REMOTE_ADDR (behind a proxy: configure ProxyFix first).
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        rate_limiter: RateLimiter | None = None,
+        concurrency: ConcurrencyLimiter | None = None,
+        exempt_paths: tuple[str, ...] = (),
+        error_body: Callable[[str, str], Any] = default_error_body,
+    ) -> None:
+        self.app = app
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.exempt_paths = exempt_paths
+        self.error_body = error_body
+
+    def __call__(self, environ: dict, start_response: Callable):
+        if self.exempt_paths and environ.get("PATH_INFO", "").startswith(self.exempt_paths):
+            return self.app(environ, start_response)
+        rejected = check_overload(self.rate_limiter, self.concurrency, environ.get("REMOTE_ADDR", "-"),
+                                  environ.get("HTTP_X_REQUEST_START"))
+        if rejected is not None:
+            status, code, message, retry_after = rejected
+            body = jsonenc.dumps_bytes(self.error_body(code, message))
+            start_response(f"{status} {'Too Many Requests' if status == 429 else 'Service Unavailable'}", [
+                ("Content-Type", "application/json"),
+                ("Content-Length", str(len(body))),
+                ("Retry-After", str(retry_after)),
+            ])
+            return [body]
+        if self.concurrency is None:
+            return self.app(environ, start_response)
+
+        start = perf_counter()
+        latency: list[float] = []
+
+        def timed_start_response(*args):
+            latency.append(perf_counter() - start)
+            return start_response(*args)
+
+        def release() -> None:
+            self.concurrency.release(latency[0] if latency else perf_counter() - start)
+
+        try:
+            body = self.app(environ, timed_start_response)
+        except BaseException:
+            release()
+            raise
+        return _ReleaseOnClose(body, release)
+
+
+class ASGIOverloadMiddleware:
+    """
+    Usage (FastAPI): app.add_middleware(ASGIOverloadMiddleware, rate_limiter=..., concurrency=...)
+    Same checks as the WSGI version; clients are keyed by scope["client"] host.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        rate_limiter: RateLimiter | None = None,
+        concurrency: ConcurrencyLimiter | None = None,
+        exempt_paths: tuple[str, ...] = (),
+        error_body: Callable[[str, str], Any] = default_error_body,
+    ) -> None:
+        self.app = app
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.exempt_paths = exempt_paths
+        self.error_body = error_body
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or (self.exempt_paths and scope["path"].startswith(self.exempt_paths)):
+            await self.app(scope, receive, send)
+            return
+        client = scope.get("client")
+        request_start = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"x-request-start"), None)
+        rejected = check_overload(self.rate_limiter, self.concurrency, client[0] if client else "-", request_start)
+        if rejected is not None:
+            status, code, message, retry_after = rejected
+            body = jsonenc.dumps_bytes(self.error_body(code, message))
+            await send({"type": "http.response.start", "status": status, "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        if self.concurrency is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        latency: list[float] = []
+
+        async def timed_send(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                latency.append(perf_counter() - start)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            self.concurrency.release(latency[0] if latency else perf_counter() - start)
@@ -0,0 +1,95 @@
+"""
+records.py
+----------
+Compact task records: __slots__ + epoch-microsecond timestamps.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from typing import Any, Hashable, Iterator
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_us(dt: datetime) -> int:
+    """Naive UTC datetime -> integer microseconds since the epoch."""
+    return (dt - EPOCH) // timedelta(microseconds=1)
+
+
+def from_us(us: int) -> datetime:
+    return EPOCH + timedelta(microseconds=us)
+
+
+class TaskRecord(Mapping):
+    """
+    WHAT: one task, stored as 6 slots instead of a dict + 2 datetime objects.
+    WHY: at millions of tasks, a per-task dict (hash table) and two datetime
+    objects cost several hundred bytes each. Slots + ints cost far less
+    (see `python Day8_benchmarks.py task-memory`).
+
+    It still reads like the old dict: task["title"], task["createdAt"]
+    (a datetime, built on access), TaskOut(**task). Records are immutable:
+    with_changes() returns a new record, which is what the store's
+    copy-on-write updates need anyway.
+    """
+
+    __slots__ = ("id", "title", "status", "created_us", "updated_us", "version")
+
+    FIELDS = ("id", "title", "status", "createdAt", "updatedAt", "version")
+
+    def __init__(self, id: Hashable, title: str, status: str, created_us: int, updated_us: int, version: int = 1):
+        set_ = object.__setattr__
+        set_(self, "id", id)
+        set_(self, "title", title)
+        set_(self, "status", status)
+        set_(self, "created_us", created_us)
+        # Share the int object when created == updated (the common case for new tasks).
+        set_(self, "updated_us", created_us if updated_us == created_us else updated_us)
+        set_(self, "version", version)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("TaskRecord is immutable; use with_changes()")
+
+    @classmethod
+    def from_dict(cls, task: Mapping) -> "TaskRecord":
+        if isinstance(task, TaskRecord):
+            return task
+        return cls(
+            task["id"], task["title"], task["status"],
+            to_us(task["createdAt"]), to_us(task["updatedAt"]), task.get("version", 1),
+        )
+
+    def with_changes(self, changes: Mapping) -> "TaskRecord":
+        """New record with `changes` applied (dict-style keys) and version + 1."""
+        updated_at = changes.get("updatedAt")
+        return TaskRecord(
+            self.id,
+            changes.get("title", self.title),
+            changes.get("status", self.status),
+            self.created_us,
+            to_us(updated_at) if updated_at is not None else self.updated_us,
+            self.version + 1,
+        )
+
+    # -----------------------------
+    # Mapping protocol (dict-style reads)
+    # -----------------------------
+    def __getitem__(self, key: str) -> Any:
+        if key == "createdAt":
+            return from_us(self.created_us)
+        if key == "updatedAt":
+            return from_us(self.updated_us)
+        if key in ("id", "title", "status", "version"):
+            return object.__getattribute__(self, key)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __repr__(self) -> str:
+        return f"TaskRecord({dict(self)!r})"
@@ -0,0 +1,105 @@
+"""
+search.py
+---------
+Title search for the in-memory task store: tokenizer + inverted index.
+"""
+
+from __future__ import annotations
+
+import heapq
+import re
+from typing import Hashable, Iterable
+
+from .records import TaskRecord
+
+TOKEN_RE = re.compile(r"\w+")
+_MISSING = object()
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased words: "Pay INVOICE #42" -> ["pay", "invoice", "42"]."""
+    return TOKEN_RE.findall(text.lower())
+
+
+class InvertedIndex:
+    """
+    WHAT: token -> set of task ids whose title contains that word.
+    WHY: `?q=invoice` as a substring scan reads every title (O(N x len)).
+    With postings, a query touches only the tasks that contain its words:
+    AND = intersect the sets, smallest first, so cost ~ the rarest word.
+
+    RULE: the store calls add/remove under its index lock on every write,
+    and match() is called under the same lock (sets can't be iterated
+    while another thread changes them).
+    """
+
+    __slots__ = ("_postings",)
+
+    def __init__(self) -> None:
+        # token -> set of ids, or the bare id while only one task has the
+        # word. Most words are rare (numbers, names): an empty set alone
+        # costs ~216 bytes, so one set per unique word used to be the
+        # biggest per-task cost of the store. Ids are hashable, so an id
+        # is never a set: `type(p) is set` tells the two apart.
+        self._postings: dict[str, set[Hashable] | Hashable] = {}
+
+    def __len__(self) -> int:
+        """Number of distinct words."""
+        return len(self._postings)
+
+    def reset(self, tasks: Iterable[TaskRecord]) -> None:
+        self._postings = {}
+        for task in tasks:
+            self.add(task.id, task.title)
+
+    def add(self, task_id: Hashable, title: str) -> None:
+        postings = self._postings
+        for token in set(tokenize(title)):
+            ids = postings.get(token, _MISSING)
+            if ids is _MISSING:
+                postings[token] = task_id
+            elif type(ids) is set:
+                ids.add(task_id)
+            elif ids != task_id:
+                postings[token] = {ids, task_id}
+
+    def remove(self, task_id: Hashable, title: str) -> None:
+        postings = self._postings
+        for token in set(tokenize(title)):
+            ids = postings.get(token, _MISSING)
+            if type(ids) is set:
+                ids.discard(task_id)
+                if len(ids) == 1:
+                    postings[token] = next(iter(ids))
+            elif ids is not _MISSING and ids == task_id:
+                del postings[token]  # keep the vocabulary from growing forever
+
+    def match(self, tokens: Iterable[str]) -> set[Hashable]:
+        """Ids whose title contains EVERY token (AND)."""
+        postings = []
+        for token in set(tokens):
+            ids = self._postings.get(token, _MISSING)
+            if ids is _MISSING:
+                return set()
+            postings.append(ids if type(ids) is set else {ids})
+        if not postings:
+            return set()
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+
+def rank(tasks: Iterable[TaskRecord], tokens: list[str], offset: int, limit: int) -> list[TaskRecord]:
+    """
+    Best matches first. Every match contains every query word (AND), so
+    what separates them is how much of the title the query covers:
+    "invoice" ranks "Invoice" above "Send invoice to ACME". Ties: newest first.
+    Only the top offset+limit are kept (heap), not a full sort.
+    """
+    wanted = set(tokens)
+
+    def score(task: TaskRecord) -> tuple[float, int]:
+        words = tokenize(task.title)
+        hits = sum(1 for word in words if word in wanted)
+        return hits / len(words), task.created_us
+
+    return heapq.nlargest(offset + limit, tasks, key=score)[offset:]
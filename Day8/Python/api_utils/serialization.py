@@ -0,0 +1,70 @@
+"""
+serialization.py
+----------------
+Per-task cache of encoded JSON fragments, keyed by task version.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+class FragmentCache:
+    """
+    WHAT: task_id -> (version, encoded JSON bytes for that task), LRU-bounded.
+    WHY: list pages re-serialized every task on every call (isoformat() x2,
+    a new dict, json encoding) even when nothing changed. With the cache,
+    a page is mostly b",".join(cached_bytes).
+    WHEN stale: the store bumps task["version"] on every update, so a
+    version mismatch means "re-render". Deleted tasks should be discard()-ed.
+    BOUND: at most `max_entries` fragments (least recently served dropped
+    first), so a store with millions of tasks, or a client paging through
+    all of them, cannot grow the cache to a copy of the whole store.
+    """
+
+    __slots__ = ("_render", "_entries", "_lock", "max_entries")
+
+    def __init__(self, render: Callable[[dict], bytes], max_entries: int = 100_000) -> None:
+        self._render = render
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, tuple[int, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, task: dict, keep: bool = True) -> bytes:
+        """
+        Cached bytes for this version of the task, rendered on a miss.
+        keep=False: use a hit but do not store a miss (one-off full scans
+        such as exports would otherwise push the hot pages out).
+        """
+        task_id, version = task["id"], task["version"]
+        entry = self._entries.get(task_id)
+        if entry is not None and entry[0] == version:
+            # Lock-free hit (each OrderedDict call is atomic under the GIL);
+            # KeyError = evicted by a writer meanwhile, the bytes are still good.
+            try:
+                self._entries.move_to_end(task_id)
+            except KeyError:
+                pass
+            return entry[1]
+        fragment = self._render(task)  # outside the lock: the slow part
+        if not keep:
+            return fragment
+        with self._lock:
+            self._entries[task_id] = (version, fragment)
+            self._entries.move_to_end(task_id)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def discard(self, task_id: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(task_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
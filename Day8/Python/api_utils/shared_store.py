@@ -0,0 +1,258 @@
+"""
+shared_store.py
+---------------
+Cross-process task store backed by one SQLite file in WAL mode.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Hashable, Iterator
+
+from .records import from_us, to_us
+from .search import tokenize
+from .store import TASK_STATUSES
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS tasks (
+  id TEXT PRIMARY KEY,
+  title TEXT NOT NULL,
+  status TEXT NOT NULL,
+  created_us INTEGER NOT NULL,
+  updated_us INTEGER NOT NULL,
+  version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_tasks_order ON tasks (created_us, id);
+CREATE INDEX IF NOT EXISTS ix_tasks_status_order ON tasks (status, created_us, id);
+CREATE INDEX IF NOT EXISTS ix_tasks_updated ON tasks (updated_us, id);
+CREATE INDEX IF NOT EXISTS ix_tasks_status_updated ON tasks (status, updated_us, id);
+
+-- Row counts kept by triggers, so `total` is a lookup instead of COUNT(*).
+CREATE TABLE IF NOT EXISTS task_counts (status TEXT PRIMARY KEY, n INTEGER NOT NULL);
+INSERT OR IGNORE INTO task_counts VALUES ('*', 0), ('todo', 0), ('doing', 0), ('done', 0);
+CREATE TRIGGER IF NOT EXISTS tr_tasks_ins AFTER INSERT ON tasks BEGIN
+  UPDATE task_counts SET n = n + 1 WHERE status IN ('*', NEW.status);
+END;
+CREATE TRIGGER IF NOT EXISTS tr_tasks_del AFTER DELETE ON tasks BEGIN
+  UPDATE task_counts SET n = n - 1 WHERE status IN ('*', OLD.status);
+END;
+CREATE TRIGGER IF NOT EXISTS tr_tasks_status AFTER UPDATE OF status ON tasks
+WHEN NEW.status <> OLD.status BEGIN
+  UPDATE task_counts SET n = n - 1 WHERE status = OLD.status;
+  UPDATE task_counts SET n = n + 1 WHERE status = NEW.status;
+END;
+
+-- Store-wide change counter (list-page ETags), bumped by every write.
+-- Seeded with the file's creation time in us, not 0 (same rule as TaskStore):
+-- a deleted and recreated file must not hand out "s1" again for other data.
+CREATE TABLE IF NOT EXISTS store_version (id INTEGER PRIMARY KEY CHECK (id = 0), v INTEGER NOT NULL);
+INSERT OR IGNORE INTO store_version
+VALUES (0, CAST((julianday('now') - 2440587.5) * 86400000000 AS INTEGER));
+CREATE TRIGGER IF NOT EXISTS tr_version_ins AFTER INSERT ON tasks BEGIN
+  UPDATE store_version SET v = v + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS tr_version_upd AFTER UPDATE ON tasks BEGIN
+  UPDATE store_version SET v = v + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS tr_version_del AFTER DELETE ON tasks BEGIN
+  UPDATE store_version SET v = v + 1;
+END;
+
+-- Title search: FTS5 index over tasks.title (external content = no second
+-- copy of the titles), kept in sync by triggers like the counts above.
+CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(title, content='tasks', content_rowid='rowid');
+CREATE TRIGGER IF NOT EXISTS tr_fts_ins AFTER INSERT ON tasks BEGIN
+  INSERT INTO tasks_fts (rowid, title) VALUES (NEW.rowid, NEW.title);
+END;
+CREATE TRIGGER IF NOT EXISTS tr_fts_del AFTER DELETE ON tasks BEGIN
+  INSERT INTO tasks_fts (tasks_fts, rowid, title) VALUES ('delete', OLD.rowid, OLD.title);
+END;
+CREATE TRIGGER IF NOT EXISTS tr_fts_title AFTER UPDATE OF title ON tasks BEGIN
+  INSERT INTO tasks_fts (tasks_fts, rowid, title) VALUES ('delete', OLD.rowid, OLD.title);
+  INSERT INTO tasks_fts (rowid, title) VALUES (NEW.rowid, NEW.title);
+END;
+"""
+
+COLUMNS = {"title": "title", "status": "status", "updatedAt": "updated_us"}
+# ?sort= field -> (column, position in a row)
+SORT_COLUMNS = {"createdAt": ("created_us", 3), "updatedAt": ("updated_us", 4)}
+
+
+class SqliteTaskStore:
+    """
+    WHAT: same interface as TaskStore, but rows live in a SQLite file.
+    WHY: pre-fork servers (gunicorn -w 8) run one Python process per worker;
+    a module-level dict is private to each worker. Every worker on the host
+    can open the same file: no external service to run.
+
+    ENGINEERING:
+    - WAL journal: readers never block the writer (and vice versa).
+    - synchronous=NORMAL: fsync at checkpoints, not on every commit.
+    - One connection per (process, thread): sqlite3 connections must not
+      cross threads, and must never be inherited across fork().
+    - Timestamps are stored as integer microseconds (compact, sortable).
+    - Writes are single statements or BEGIN IMMEDIATE transactions, so a
+      patch in one worker can't overwrite a concurrent patch in another.
+    """
+
+    def __init__(self, path: str, id_type: Callable[[str], Any] = str) -> None:
+        self.path = path
+        self._id_type = id_type
+        self._local = threading.local()
+        with self._conn() as conn:
+            had_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'").fetchone()
+            conn.executescript(SCHEMA_SQL)
+            if not had_fts:
+                # File from before search existed: index the rows it already has.
+                conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+    def _conn(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+    def _row_to_task(self, row: tuple) -> dict:
+        task_id, title, status, created_us, updated_us, version = row
+        return {
+            "id": self._id_type(task_id),
+            "title": title,
+            "status": status,
+            "createdAt": from_us(created_us),
+            "updatedAt": from_us(updated_us),
+            "version": version,
+        }
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    @property
+    def version(self) -> int:
+        return self._conn().execute("SELECT v FROM store_version").fetchone()[0]
+
+    def get(self, task_id: Hashable) -> dict | None:
+        row = self._conn().execute("SELECT * FROM tasks WHERE id = ?", (str(task_id),)).fetchone()
+        return self._row_to_task(row) if row else None
+
+    def __contains__(self, task_id: Hashable) -> bool:
+        return self._conn().execute("SELECT 1 FROM tasks WHERE id = ?", (str(task_id),)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def values(self) -> Iterator[dict]:
+        for row in self._conn().execute("SELECT * FROM tasks ORDER BY created_us, id"):
+            yield self._row_to_task(row)
+
+    def count(self, status: str | None = None) -> int:
+        row = self._conn().execute("SELECT n FROM task_counts WHERE status = ?", (status or "*",)).fetchone()
+        return row[0] if row else 0
+
+    def page(
+        self, status: str | None, offset: int, limit: int, sort: str = "createdAt"
+    ) -> tuple[list[dict], int]:
+        column, _ = SORT_COLUMNS[sort.lstrip("-")]
+        direction = "DESC" if sort.startswith("-") else "ASC"
+        sql, params = "SELECT * FROM tasks", []
+        if status is not None:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += f" ORDER BY {column} {direction}, id {direction} LIMIT ? OFFSET ?"
+        rows = self._conn().execute(sql, (*params, limit, offset)).fetchall()
+        return [self._row_to_task(r) for r in rows], self.count(status)
+
+    def page_after(
+        self, status: str | None, after: tuple[int, Hashable] | None, limit: int, sort: str = "createdAt"
+    ) -> tuple[list[dict], tuple[int, Hashable] | None]:
+        if limit < 1:
+            raise ValueError("limit must be >= 1")
+        column, position = SORT_COLUMNS[sort.lstrip("-")]
+        descending = sort.startswith("-")
+        direction = "DESC" if descending else "ASC"
+        where, params = [], []
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        if after is not None:
+            where.append(f"({column}, id) {'<' if descending else '>'} (?, ?)")
+            params += [after[0], str(after[1])]
+        sql = "SELECT * FROM tasks"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {column} {direction}, id {direction} LIMIT ?"
+        rows = self._conn().execute(sql, (*params, limit + 1)).fetchall()
+        items = [self._row_to_task(r) for r in rows[:limit]]
+        next_key = (rows[limit - 1][position], items[-1]["id"]) if len(rows) > limit else None
+        return items, next_key
+
+    def search(self, query: str, status: str | None, offset: int, limit: int) -> tuple[list[dict], int]:
+        """Same contract as TaskStore.search; ranked by SQLite's bm25(), then newest first."""
+        tokens = tokenize(query)
+        if not tokens:
+            return [], 0
+        match = " ".join(f'"{token}"' for token in tokens)  # quoted words, implicit AND
+        where, params = "tasks_fts MATCH ?", [match]
+        if status is not None:
+            where += " AND t.status = ?"
+            params.append(status)
+        sql = f"FROM tasks_fts JOIN tasks t ON t.rowid = tasks_fts.rowid WHERE {where}"
+        conn = self._conn()
+        rows = conn.execute(
+            f"SELECT t.* {sql} ORDER BY bm25(tasks_fts), t.created_us DESC LIMIT ? OFFSET ?",
+            (*params, limit, offset),
+        ).fetchall()
+        total = conn.execute(f"SELECT COUNT(*) {sql}", params).fetchone()[0]
+        return [self._row_to_task(r) for r in rows], total
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def add(self, task: dict) -> dict:
+        task.setdefault("version", 1)
+        self._conn().execute(
+            "INSERT INTO tasks VALUES (?, ?, ?, ?, ?, ?)",
+            (str(task["id"]), task["title"], task["status"],
+             to_us(task["createdAt"]), to_us(task["updatedAt"]), task["version"]),
+        )
+        return task
+
+    def update(self, task_id: Hashable, changes: dict) -> dict | None:
+        sets, params = [], []
+        for field, value in changes.items():
+            if field not in COLUMNS:
+                raise KeyError(f"Unknown task field: {field}")
+            if field == "status" and value not in TASK_STATUSES:
+                raise ValueError(f"Invalid status: {value}")
+            sets.append(f"{COLUMNS[field]} = ?")
+            params.append(to_us(value) if field == "updatedAt" else value)
+        sets.append("version = version + 1")
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")  # take the write lock before reading
+        try:
+            cur = conn.execute(f"UPDATE tasks SET {', '.join(sets)} WHERE id = ?", (*params, str(task_id)))
+            row = conn.execute("SELECT * FROM tasks WHERE id = ?", (str(task_id),)).fetchone() if cur.rowcount else None
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self._row_to_task(row) if row else None
+
+    def remove(self, task_id: Hashable) -> dict | None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM tasks WHERE id = ?", (str(task_id),)).fetchone()
+            if row:
+                conn.execute("DELETE FROM tasks WHERE id = ?", (str(task_id),))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self._row_to_task(row) if row else None
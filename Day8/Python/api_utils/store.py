@@ -0,0 +1,305 @@
+"""
+store.py
+--------
+In-memory task store: primary dict + ordered secondary indexes.
+Thread-safe for threaded WSGI/ASGI workers (lock striping, lock-free reads).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Hashable, Iterable, Iterator
+
+from .indexes import SortedIndex
+from .records import TaskRecord
+from .search import InvertedIndex, rank, tokenize
+
+if TYPE_CHECKING:
+    from .wal import WriteAheadLog
+
+TASK_STATUSES = ("todo", "doing", "done")
+# ?sort= values; a leading "-" means newest first.
+SORT_OPTIONS = ("createdAt", "-createdAt", "updatedAt", "-updatedAt")
+
+
+def index_key(task: TaskRecord) -> tuple[int, Hashable]:
+    """Sort key of the createdAt indexes: oldest first, id breaks ties."""
+    return (task.created_us, task.id)
+
+
+def updated_key(task: TaskRecord, created_key: tuple[int, Hashable] | None = None) -> tuple[int, Hashable]:
+    """
+    Sort key of the updatedAt indexes. Pass the task's index_key() to reuse
+    that tuple when updatedAt == createdAt (never-patched tasks): one 56-byte
+    tuple per task shared by all four indexes instead of two.
+    """
+    if created_key is not None and task.updated_us == task.created_us:
+        return created_key
+    return (task.updated_us, task.id)
+
+
+class TaskStore:
+    """
+    WHAT: dict of TaskRecords by id + SortedIndex over all tasks + one per status.
+    WHY: `?status=done` used to scan every task. With an index per status,
+    filtered listing is a slice and `total` is len() -> O(log N + page).
+    Keys are (createdAt µs, id), so the same indexes serve keyset (cursor) pages.
+    A second set keyed by (updatedAt µs, id) serves `?sort=-updatedAt`; a
+    descending sort reads the same index from the end (no sorted() per request).
+    RULE: all writes go through add/update/remove so indexes stay in sync.
+    Every task carries a "version" (1 on add, +1 per update) that caches
+    can use to tell whether what they hold is still current. The store
+    itself has a `version` too, bumped by every write (list-page ETags).
+    Titles are also indexed word by word for search() (see search.py).
+
+    CONCURRENCY (threaded servers):
+    - Writes to one task take that task's stripe lock: hash(id) % stripes.
+      Two patches to the same task can't lose an update (read-modify-write
+      is atomic); building the new record and encoding its WAL line happen
+      under the stripe only, so patches to different tasks overlap there.
+    - The shared indexes have their own lock, held only for the index
+      mutation itself (dict set + insort/remove). That part is still serial
+      for all writers, and under the GIL pure-Python work doesn't run in
+      parallel anyway: don't expect write throughput to grow with threads
+      (`python Day8_benchmarks.py store-threads`). What striping buys is
+      correctness without one big lock around the whole request.
+    - Reads take no lock. Records are immutable: update() publishes a new
+      record, so a reader never sees a half-applied patch.
+
+    MEMORY: add() accepts a plain task dict but stores a compact TaskRecord
+    (records.py); callers keep reading it like a dict.
+
+    DURABILITY (optional): pass a WriteAheadLog and every write is also
+    appended to it, after it is published but before its stripe lock is
+    released. So the log order per task matches the order its writes became
+    visible (writes to different tasks commute), and a checkpoint() that
+    lands between publish and append only means the tail replays a "put"
+    the snapshot already has (replay is idempotent). See wal.py and snapshot.py.
+    """
+
+    def __init__(self, stripes: int = 64, wal: WriteAheadLog | None = None) -> None:
+        self._tasks: dict[Hashable, TaskRecord] = {}
+        self._order = SortedIndex()
+        self._by_status: dict[str, SortedIndex] = {s: SortedIndex() for s in TASK_STATUSES}
+        self._updated = SortedIndex()
+        self._updated_by_status: dict[str, SortedIndex] = {s: SortedIndex() for s in TASK_STATUSES}
+        self._titles = InvertedIndex()
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._index_lock = threading.Lock()
+        self._wal = wal
+        # Start from the boot time (us), not 0: a restarted process (e.g. after a
+        # WAL replay) must never hand out a list ETag it already used for other data.
+        self._version = time.time_ns() // 1000
+
+    def _index(self, status: str | None, sort: str = "createdAt") -> SortedIndex | None:
+        if sort.lstrip("-") == "updatedAt":
+            return self._updated if status is None else self._updated_by_status.get(status)
+        return self._order if status is None else self._by_status.get(status)
+
+    def _stripe(self, task_id: Hashable) -> threading.Lock:
+        return self._stripes[hash(task_id) % len(self._stripes)]
+
+    def _resolve(self, keys: Iterable[tuple[int, Hashable]]) -> list[TaskRecord]:
+        # Lock-free read: a task deleted after we sliced the index is skipped.
+        tasks = self._tasks
+        return [task for key in keys if (task := tasks.get(key[1])) is not None]
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    @property
+    def version(self) -> int:
+        """Store-wide change counter. Read it BEFORE reading the data it describes."""
+        return self._version
+
+    def get(self, task_id: Hashable) -> TaskRecord | None:
+        return self._tasks.get(task_id)
+
+    def __contains__(self, task_id: Hashable) -> bool:
+        return task_id in self._tasks
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def values(self):
+        return self._tasks.values()
+
+    def count(self, status: str | None = None) -> int:
+        index = self._index(status)
+        return len(index) if index is not None else 0
+
+    def page(
+        self, status: str | None, offset: int, limit: int, sort: str = "createdAt"
+    ) -> tuple[list[TaskRecord], int]:
+        """Offset mode: return (tasks on this page, total matching), in `sort` order."""
+        index = self._index(status, sort)
+        if index is None:
+            return [], 0
+        return self._resolve(index.slice(offset, limit, sort.startswith("-"))), len(index)
+
+    def page_after(
+        self, status: str | None, after: tuple[int, Hashable] | None, limit: int, sort: str = "createdAt"
+    ) -> tuple[list[TaskRecord], tuple[int, Hashable] | None]:
+        """
+        Keyset mode: return (tasks after `after`, key for the next page or None).
+        WHY: cost is O(log N + page) at any depth, and inserts (always newest)
+        never shift rows between pages the way OFFSET does.
+        """
+        if limit < 1:
+            raise ValueError("limit must be >= 1")
+        index = self._index(status, sort)
+        if index is None:
+            return [], None
+        keys = index.after(after, limit + 1, sort.startswith("-"))  # one extra = "is there a next page?"
+        items = self._resolve(keys[:limit])
+        return items, (keys[limit - 1] if len(keys) > limit else None)
+
+    def search(self, query: str, status: str | None, offset: int, limit: int) -> tuple[list[TaskRecord], int]:
+        """
+        Title search: tasks whose title contains every word of `query`,
+        best match first. Returns (tasks on this page, total matching).
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return [], 0
+        with self._index_lock:
+            ids = self._titles.match(tokens)
+        tasks = self._tasks
+        matches = [task for task_id in ids
+                   if (task := tasks.get(task_id)) is not None and (status is None or task.status == status)]
+        return rank(matches, tokens, offset, limit), len(matches)
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def load(self, records: Iterable[TaskRecord]) -> None:
+        """
+        Bulk-load records (WAL replay / snapshot) into an empty store.
+        WHY not add() in a loop: one sort per index is O(N log N) total,
+        and nothing is written back to the log.
+        """
+        with self._index_lock:
+            if self._tasks:
+                raise RuntimeError("load() needs an empty store")
+            for task in records:
+                self._tasks[task.id] = task
+            created = {task_id: index_key(t) for task_id, t in self._tasks.items()}
+            keys = sorted(created.values())
+            self._order.reset(keys)
+            for status, index in self._by_status.items():
+                index.reset([key for key in keys if self._tasks[key[1]].status == status])
+            keys = sorted(updated_key(t, created[task_id]) for task_id, t in self._tasks.items())
+            self._updated.reset(keys)
+            for status, index in self._updated_by_status.items():
+                index.reset([key for key in keys if self._tasks[key[1]].status == status])
+            self._titles.reset(self._tasks.values())
+            self._version += 1
+
+    def add(self, task: Mapping) -> TaskRecord:
+        task = TaskRecord.from_dict(task)
+        key = index_key(task)
+        upd_key = updated_key(task, key)
+        line = self._wal.encode_put(task) if self._wal is not None else None
+        with self._stripe(task.id):
+            with self._index_lock:
+                self._tasks[task.id] = task
+                self._order.add(key)
+                self._by_status[task.status].add(key)
+                self._updated.add(upd_key)
+                self._updated_by_status[task.status].add(upd_key)
+                self._titles.add(task.id, task.title)
+                self._version += 1
+            if line is not None:
+                self._wal.write(line)
+        return task
+
+    def update(self, task_id: Hashable, changes: dict) -> TaskRecord | None:
+        """
+        Publish a new version of the task with `changes` applied
+        (copy-on-write) and move it between status indexes if needed.
+        """
+        with self._stripe(task_id):
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            new_task = task.with_changes(changes)
+            line = self._wal.encode_put(new_task) if self._wal is not None else None
+            key = index_key(task)
+            old_key, new_key = updated_key(task, key), updated_key(new_task, key)
+            moved = new_task.status != task.status
+            with self._index_lock:
+                if moved:
+                    self._by_status[task.status].remove(key)
+                    self._by_status[new_task.status].add(key)
+                if new_key != old_key or moved:
+                    # Recently updated tasks move to the end: insort ~ append.
+                    self._updated.remove(old_key)
+                    self._updated.add(new_key)
+                    self._updated_by_status[task.status].remove(old_key)
+                    self._updated_by_status[new_task.status].add(new_key)
+                if new_task.title != task.title:
+                    self._titles.remove(task_id, task.title)
+                    self._titles.add(task_id, new_task.title)
+                self._tasks[task_id] = new_task
+                self._version += 1
+            if line is not None:
+                self._wal.write(line)
+        return new_task
+
+    def remove(self, task_id: Hashable) -> TaskRecord | None:
+        line = self._wal.encode_delete(task_id) if self._wal is not None else None
+        with self._stripe(task_id):
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            key = index_key(task)
+            upd_key = updated_key(task, key)
+            with self._index_lock:
+                self._order.remove(key)
+                self._by_status[task.status].remove(key)
+                self._updated.remove(upd_key)
+                self._updated_by_status[task.status].remove(upd_key)
+                self._titles.remove(task_id, task.title)
+                del self._tasks[task_id]
+                self._version += 1
+            if line is not None:
+                self._wal.write(line)
+        return task
+
+    def checkpoint(self) -> tuple[list[TaskRecord], int | None]:
+        """
+        Point-in-time copy for snapshots: (all records, WAL offset). Every
+        write before the offset is in the copy; writes published but not yet
+        logged sit after it and replay idempotently. Only a list of references
+        is copied under the lock (records are immutable); encoding them
+        happens later, outside of any lock.
+        WHY the offset is read first, outside _index_lock: a WAL line is
+        written only after its write is published, so everything before the
+        offset is already in the dict when we copy it. Reading it under the
+        index lock would make every index mutation wait on the WAL lock too.
+        """
+        wal_offset = self._wal.tell() if self._wal is not None else None
+        with self._index_lock:
+            return list(self._tasks.values()), wal_offset
+
+    def close(self) -> None:
+        """Flush + close the write-ahead log, if there is one."""
+        if self._wal is not None:
+            self._wal.close()
+
+
+def scan_tasks(store, status: str | None = None, chunk_size: int = 500) -> Iterator[Mapping]:
+    """
+    Yield every task in (createdAt, id) order, one keyset page at a time.
+    WHY: exports must not build a list of all tasks; memory stays at one
+    chunk no matter how big the store is. Works with any store that has
+    page_after() (TaskStore, SqliteTaskStore).
+    """
+    after = None
+    while True:
+        items, after = store.page_after(status, after, chunk_size)
+        yield from items
+        if after is None:
+            return